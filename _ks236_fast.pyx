@@ -0,0 +1,18 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Compiled checksum helper for ks236_energy_get.py
+
+Optional accelerator for the checksum the reader folds over each received
+chunk. When the extension has been built (cythonize -i _ks236_fast.pyx) the
+reader uses it instead of its pure-Python version; otherwise nothing changes.
+"""
+
+
+cpdef int calculate_bcc(const unsigned char[::1] data):
+    """Calculate BCC checksum (XOR of all bytes)"""
+    cdef Py_ssize_t i
+    cdef unsigned char bcc = 0
+    for i in range(data.shape[0]):
+        bcc ^= data[i]
+    return bcc
+
@@ -20,10 +20,50 @@ Date: 2025-06-30
 """
 
 import serial
+import serial.rs485
 import time
 import argparse
 import sys
-from typing import Optional, Dict, List, Any
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Optional, Dict, List, Tuple
+
+try:
+    import _ks236_fast  # Optional compiled helpers, see _ks236_fast.pyx
+except ImportError:
+    _ks236_fast = None
+
+@dataclass
+class ProbeEnergy:
+    """Energy parameters read from one probe; hex forms are formatted on first use"""
+    
+    probe_num: int
+    response: bytes
+    range_2_5m: Dict[str, int]
+    range_1_5m: Dict[str, int]
+    range_6_5m: Dict[str, int]
+    
+    @cached_property
+    def probe_id(self) -> str:
+        return '0x' + self.response[2:3].hex().upper()
+    
+    @cached_property
+    def fixed_params(self) -> Dict[str, str]:
+        return {
+            'param1': '0x' + self.response[12:13].hex().upper(),
+            'param2': '0x' + self.response[13:14].hex().upper()
+        }
+    
+    @cached_property
+    def bcc(self) -> str:
+        return '0x' + self.response[14:15].hex().upper()
+    
+    @cached_property
+    def raw_response(self) -> str:
+        return self.response.hex(' ').upper()
 
 class KS236EnergyReader:
     """KS236 ultrasonic probe energy parameter reader"""
@@ -35,9 +75,15 @@ class KS236EnergyReader:
         1: 0xD1, 2: 0xD2, 3: 0xD3, 4: 0xD4, 5: 0xD5,
         6: 0xD6, 7: 0xD7, 8: 0xD8, 9: 0xD9
     }
+    _PROBE_SET = frozenset(PROBE_PARAMS)
     EXPECTED_RESPONSE_LENGTH = 15
+    READ_POLL_INTERVAL = 0.05  # Per-read serial timeout while waiting for a frame
+    INTER_PROBE_DELAY = 0.1  # Minimum bus idle time between two queries
+    _UNPACK_RESPONSE = struct.Struct('<15B').unpack
+    _FOLD_MASK_128 = (1 << 128) - 1
     
-    def __init__(self, device_path: str = '/dev/ttyUS', baudrate: int = 115200, timeout: int = 3):
+    def __init__(self, device_path: str = '/dev/ttyUS', baudrate: int = 115200, timeout: int = 3,
+                 poll_parallelism: Optional[int] = None, quiet: bool = False, rs485: bool = False):
         """
         Initialize the KS236 energy reader
         
@@ -45,11 +91,35 @@ class KS236EnergyReader:
             device_path: Serial device path
             baudrate: Communication baudrate
             timeout: Read timeout in seconds
+            poll_parallelism: Number of worker threads used to poll probes
+                (default: one per bus); probes on the same bus are still
+                queried one at a time
+            quiet: Suppress per-probe progress output
+            rs485: Let the kernel driver toggle RTS for the RS485 transceiver
+                instead of padding with an inter-probe delay
         """
         self.device_path = device_path
         self.baudrate = baudrate
         self.timeout = timeout
+        self.poll_parallelism = poll_parallelism
+        self.quiet = quiet
+        self.rs485 = rs485
+        self._log: List[str] = []
+        self._log_lock = threading.Lock()
         self.serial_port = None
+        self._bus_ports = {}
+        self._bus_gaps = {}
+        
+        # Query commands and response headers depend only on the probe
+        # number, so build them once
+        self._prefixes = {
+            probe_num: bytes([self.ADDR_CODE, self.CMD_CODE, param])
+            for probe_num, param in self.PROBE_PARAMS.items()
+        }
+        self._commands = {
+            probe_num: prefix + bytes([self.calculate_bcc(prefix)])
+            for probe_num, prefix in self._prefixes.items()
+        }
         
     def calculate_bcc(self, data: bytes) -> int:
         """
@@ -61,10 +131,16 @@ class KS236EnergyReader:
         Returns:
             BCC checksum value
         """
-        bcc = 0
-        for byte in data:
-            bcc ^= byte
-        return bcc
+        # Load the frame as one integer and fold it onto itself
+        # (128 -> 64 -> 32 -> 16 -> 8 bits) so the XOR runs in C
+        value = int.from_bytes(data, 'little')
+        while value >> 128:
+            value = (value & self._FOLD_MASK_128) ^ (value >> 128)
+        value ^= value >> 64
+        value ^= value >> 32
+        value ^= value >> 16
+        value ^= value >> 8
+        return value & 0xFF
     
     def create_query_command(self, probe_num: int) -> bytes:
         """
@@ -79,13 +155,10 @@ class KS236EnergyReader:
         Raises:
             ValueError: If probe number is invalid
         """
-        if probe_num not in self.PROBE_PARAMS:
+        if probe_num not in self._PROBE_SET:
             raise ValueError(f"Invalid probe number: {probe_num}. Must be 1-9.")
         
-        param = self.PROBE_PARAMS[probe_num]
-        bcc = self.ADDR_CODE ^ self.CMD_CODE ^ param
-        
-        return bytes([self.ADDR_CODE, self.CMD_CODE, param, bcc])
+        return self._commands[probe_num]
     
     def validate_response(self, response: bytes, expected_probe_num: int) -> bool:
         """
@@ -101,23 +174,32 @@ class KS236EnergyReader:
         if len(response) != self.EXPECTED_RESPONSE_LENGTH:
             return False
         
-        # Check address and command codes
-        if response[0] != self.ADDR_CODE or response[1] != self.CMD_CODE:
-            return False
-        
-        # Check probe parameter
-        expected_param = self.PROBE_PARAMS[expected_probe_num]
-        if response[2] != expected_param:
+        # Check address code, command code and probe parameter in one compare
+        if not response.startswith(self._prefixes[expected_probe_num]):
             return False
         
         # Validate BCC checksum
-        expected_bcc = self.calculate_bcc(response[:-1])
-        if response[-1] != expected_bcc:
-            return False
+        return response[-1] == self.calculate_bcc(response[:-1])
+    
+    def validate_response_from_running_bcc(self, running_bcc: int, response: bytes,
+                                           expected_probe_num: int) -> bool:
+        """
+        Validate a response whose checksum was accumulated while reading it
         
-        return True
+        Args:
+            running_bcc: XOR of every received byte, including the trailing
+                BCC byte, so it is zero for an intact frame
+            response: Response bytes received
+            expected_probe_num: Expected probe number
+            
+        Returns:
+            True if response is valid
+        """
+        return (running_bcc == 0
+                and len(response) == self.EXPECTED_RESPONSE_LENGTH
+                and response.startswith(self._prefixes[expected_probe_num]))
     
-    def parse_response(self, response: bytes, probe_num: int) -> Dict[str, Any]:
+    def parse_response(self, response: bytes, probe_num: int) -> ProbeEnergy:
         """
         Parse response data into structured format
         
@@ -126,154 +208,250 @@ class KS236EnergyReader:
             probe_num: Probe number
             
         Returns:
-            Dictionary with parsed energy parameters
+            Parsed energy parameters
         """
-        return {
-            'probe_num': probe_num,
-            'probe_id': f"0x{response[2]:02X}",
-            'range_2_5m': {
-                'energy': response[3],
-                'time': response[4],
-                'threshold': response[5]
-            },
-            'range_1_5m': {
-                'energy': response[6],
-                'time': response[7],
-                'threshold': response[8]
-            },
-            'range_6_5m': {
-                'energy': response[9],
-                'time': response[10],
-                'threshold': response[11]
-            },
-            'fixed_params': {
-                'param1': f"0x{response[12]:02X}",
-                'param2': f"0x{response[13]:02X}"
-            },
-            'bcc': f"0x{response[14]:02X}",
-            'raw_response': ' '.join(f'{b:02X}' for b in response)
-        }
+        (_, _, _,
+         e25, t25, th25,
+         e15, t15, th15,
+         e65, t65, th65,
+         _, _, _) = self._UNPACK_RESPONSE(response)
+        
+        return ProbeEnergy(
+            probe_num=probe_num,
+            response=bytes(response),
+            range_2_5m={'energy': e25, 'time': t25, 'threshold': th25},
+            range_1_5m={'energy': e15, 'time': t15, 'threshold': th15},
+            range_6_5m={'energy': e65, 'time': t65, 'threshold': th65}
+        )
     
-    def query_probe(self, probe_num: int, max_retries: int = 3) -> Optional[Dict[str, Any]]:
+    def query_probe(self, probe_num: int, max_retries: int = 3,
+                    port: Optional[serial.Serial] = None) -> Optional[ProbeEnergy]:
         """
         Query single probe with retry mechanism
         
         Args:
             probe_num: Probe number (1-9)
             max_retries: Maximum retry attempts
+            port: Serial port the probe is wired to (default: the connected port)
             
         Returns:
             Parsed probe data or None if failed
         """
         command = self.create_query_command(probe_num)
+        port = port or self.serial_port
+        expected_length = self.EXPECTED_RESPONSE_LENGTH
+        need_flush = False
         
         for attempt in range(max_retries):
             try:
-                # Clear input buffer
-                self.serial_port.reset_input_buffer()
+                # Clear input buffer only after a failed attempt may have
+                # left a partial or late frame behind
+                if need_flush:
+                    port.reset_input_buffer()
+                    need_flush = False
                 
-                # Send command
-                bytes_sent = self.serial_port.write(command)
-                self.serial_port.flush()
+                # Send command; no flush() needed, the read below waits for
+                # the reply, which cannot arrive before the command is out
+                bytes_sent = port.write(command)
                 
                 if bytes_sent != len(command):
-                    print(f"Warning: Probe {probe_num} attempt {attempt + 1} - only sent {bytes_sent}/{len(command)} bytes")
+                    self._log_line(f"Warning: Probe {probe_num} attempt {attempt + 1} - only sent {bytes_sent}/{len(command)} bytes")
                     continue
                 
-                # Wait for response
-                time.sleep(0.1 + attempt * 0.1)  # Progressive delay
-                
-                # Read response
-                response = self.serial_port.read(self.EXPECTED_RESPONSE_LENGTH)
+                # Read response as soon as it arrives
+                response, running_bcc = self._read_exactly(port, expected_length)
                 
-                if len(response) == self.EXPECTED_RESPONSE_LENGTH:
-                    if self.validate_response(response, probe_num):
+                if len(response) == expected_length:
+                    if self.validate_response_from_running_bcc(running_bcc, response, probe_num):
                         return self.parse_response(response, probe_num)
                     else:
-                        print(f"Warning: Probe {probe_num} attempt {attempt + 1} - invalid response format")
+                        self._log_line(f"Warning: Probe {probe_num} attempt {attempt + 1} - invalid response format")
                 elif len(response) > 0:
-                    print(f"Warning: Probe {probe_num} attempt {attempt + 1} - incomplete response ({len(response)} bytes)")
+                    self._log_line(f"Warning: Probe {probe_num} attempt {attempt + 1} - incomplete response ({len(response)} bytes)")
                 else:
-                    print(f"Warning: Probe {probe_num} attempt {attempt + 1} - no response")
+                    self._log_line(f"Warning: Probe {probe_num} attempt {attempt + 1} - no response")
+                need_flush = True
                 
                 # Wait before retry
                 if attempt < max_retries - 1:
                     time.sleep(0.2)
                     
             except Exception as e:
-                print(f"Error querying probe {probe_num} attempt {attempt + 1}: {e}")
+                self._log_line(f"Error querying probe {probe_num} attempt {attempt + 1}: {e}")
+                need_flush = True
         
         return None
     
-    def connect(self) -> bool:
+    def _read_exactly(self, port: serial.Serial, size: int) -> Tuple[bytes, int]:
+        """
+        Read until size bytes have arrived or the response timeout expires
+        
+        Args:
+            port: Serial port to read from
+            size: Number of bytes expected
+            
+        Returns:
+            Bytes received (shorter than size on timeout) and the XOR of
+            those bytes, folded in chunk by chunk as they arrive
+        """
+        read = port.read
+        monotonic = time.monotonic
+        calculate_bcc = self.calculate_bcc
+        buffer = b''
+        running_bcc = 0
+        deadline = monotonic() + self.timeout
+        while len(buffer) < size and monotonic() < deadline:
+            chunk = read(size - len(buffer))
+            if chunk:
+                running_bcc ^= calculate_bcc(chunk)
+                buffer += chunk
+        return buffer, running_bcc
+    
+    def _log_line(self, message: str):
+        """Queue a progress line; written out in one go by _flush_log()"""
+        if not self.quiet:
+            with self._log_lock:
+                self._log.append(message)
+    
+    def _flush_log(self):
+        """Write all queued progress lines with a single stdout write"""
+        # Bus workers flush concurrently; take the lines under the lock so
+        # none are lost or written twice
+        with self._log_lock:
+            lines, self._log = self._log, []
+        if lines:
+            sys.stdout.write('\n'.join(lines) + '\n')
+            sys.stdout.flush()
+    
+    def connect(self, device_path: Optional[str] = None) -> bool:
         """
         Establish serial connection
         
+        Args:
+            device_path: Serial device path (default: the reader's device)
+            
         Returns:
             True if connection successful
         """
+        device_path = device_path or self.device_path
         try:
-            self.serial_port = serial.Serial(
-                port=self.device_path,
+            port = serial.Serial(
+                port=device_path,
                 baudrate=self.baudrate,
                 bytesize=serial.EIGHTBITS,
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE,
-                timeout=self.timeout,
+                timeout=self.READ_POLL_INTERVAL,
                 write_timeout=1
             )
-            print(f"✓ Connected to {self.device_path} at {self.baudrate} baud")
+            self._bus_ports[device_path] = (port, threading.Lock())
+            self._bus_gaps[device_path] = self.INTER_PROBE_DELAY
+            if device_path == self.device_path:
+                self.serial_port = port
+            print(f"✓ Connected to {device_path} at {self.baudrate} baud")
+            if self.rs485:
+                try:
+                    port.rs485_mode = serial.rs485.RS485Settings(
+                        rts_level_for_tx=True,
+                        rts_level_for_rx=False,
+                        delay_before_tx=0,
+                        delay_before_rx=0
+                    )
+                    # Direction switching now follows TX-empty in the driver
+                    self._bus_gaps[device_path] = 0.0
+                except (ValueError, NotImplementedError, serial.SerialException) as e:
+                    print(f"Warning: RS485 mode not supported on {device_path}, using inter-probe delay: {e}")
             return True
         except serial.SerialException as e:
-            print(f"✗ Failed to connect to {self.device_path}: {e}")
+            print(f"✗ Failed to connect to {device_path}: {e}")
             return False
     
     def disconnect(self):
-        """Close serial connection"""
-        if self.serial_port and self.serial_port.is_open:
-            self.serial_port.close()
-            print("✓ Serial connection closed")
+        """Close serial connections"""
+        for port, _ in self._bus_ports.values():
+            if port.is_open:
+                port.close()
+                print("✓ Serial connection closed")
+        self._bus_ports.clear()
+        self._bus_gaps.clear()
+        self.serial_port = None
     
-    def read_all_probes(self) -> List[Dict[str, Any]]:
+    def _query_on_bus(self, device_path: str, probe_num: int) -> Optional[ProbeEnergy]:
+        """Query a probe while holding its bus, so each RS485 bus has a single master"""
+        port, lock = self._bus_ports[device_path]
+        with lock:
+            self._log_line(f"\n--- Querying Probe {probe_num} ---")
+            
+            result = self.query_probe(probe_num, port=port)
+            
+            if result:
+                self._log_line(f"✓ Probe {probe_num}: Success")
+                self._log_line(f"  2.5m range: E{result.range_2_5m['energy']}/T{result.range_2_5m['time']}/Th{result.range_2_5m['threshold']}")
+                self._log_line(f"  1.5m range: E{result.range_1_5m['energy']}/T{result.range_1_5m['time']}/Th{result.range_1_5m['threshold']}")
+                self._log_line(f"  6.5m range: E{result.range_6_5m['energy']}/T{result.range_6_5m['time']}/Th{result.range_6_5m['threshold']}")
+            else:
+                self._log_line(f"✗ Probe {probe_num}: Failed to read")
+            # One write per probe keeps progress live on a slow bus
+            self._flush_log()
+            
+            # Inter-probe delay (zero when the driver handles RS485 direction)
+            gap = self._bus_gaps[device_path]
+            if gap:
+                time.sleep(gap)
+        return result
+    
+    def _poll_bus(self, device_path: str, probe_nums: List[int],
+                  results: List[Optional[ProbeEnergy]], offset: int):
+        """Query the probes wired to one bus in order, filling results[offset:]"""
+        for index, probe_num in enumerate(probe_nums, offset):
+            results[index] = self._query_on_bus(device_path, probe_num)
+    
+    def read_all_probes(self, bus_groups: Optional[List[Tuple[str, List[int]]]] = None) -> List[ProbeEnergy]:
         """
         Read energy parameters from all probes (1-9)
         
+        Args:
+            bus_groups: List of (device_path, probe_nums) pairs, one per RS485
+                adapter. Defaults to probes 1-9 on the reader's device.
+                Probes on different buses are polled concurrently.
+        
         Returns:
-            List of probe data dictionaries
+            List of probe data, in bus_groups order
         """
-        if not self.connect():
-            return []
+        if bus_groups is None:
+            bus_groups = [(self.device_path, list(range(1, 10)))]
         
-        results = []
+        for device_path in dict.fromkeys(path for path, _ in bus_groups):
+            if not self.connect(device_path):
+                self.disconnect()
+                return []
+        
+        # One slot per probe so bus workers can write results without locking
+        results = [None] * sum(len(probe_nums) for _, probe_nums in bus_groups)
         
         try:
-            print("\n" + "="*60)
-            print("Reading KS236 Ultrasonic Probe Energy Parameters")
-            print("="*60)
+            self._log_line("\n" + "="*60)
+            self._log_line("Reading KS236 Ultrasonic Probe Energy Parameters")
+            self._log_line("="*60)
             
-            for probe_num in range(1, 10):
-                print(f"\n--- Querying Probe {probe_num} ---")
-                
-                result = self.query_probe(probe_num)
-                
-                if result:
-                    results.append(result)
-                    print(f"✓ Probe {probe_num}: Success")
-                    print(f"  2.5m range: E{result['range_2_5m']['energy']}/T{result['range_2_5m']['time']}/Th{result['range_2_5m']['threshold']}")
-                    print(f"  1.5m range: E{result['range_1_5m']['energy']}/T{result['range_1_5m']['time']}/Th{result['range_1_5m']['threshold']}")
-                    print(f"  6.5m range: E{result['range_6_5m']['energy']}/T{result['range_6_5m']['time']}/Th{result['range_6_5m']['threshold']}")
-                else:
-                    print(f"✗ Probe {probe_num}: Failed to read")
+            workers = self.poll_parallelism or len(bus_groups)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = []
+                offset = 0
+                for device_path, probe_nums in bus_groups:
+                    futures.append(executor.submit(self._poll_bus, device_path, probe_nums, results, offset))
+                    offset += len(probe_nums)
                 
-                # Inter-probe delay
-                time.sleep(0.1)
+                for future in as_completed(futures):
+                    future.result()
             
         finally:
+            self._flush_log()
             self.disconnect()
         
-        return results
+        return [result for result in results if result is not None]
     
-    def print_summary(self, results: List[Dict[str, Any]]):
+    def print_summary(self, results: List[ProbeEnergy]):
         """
         Print formatted summary of results
         
@@ -294,10 +472,10 @@ class KS236EnergyReader:
         
         # Data rows
         for result in results:
-            probe_num = result['probe_num']
-            r25 = result['range_2_5m']
-            r15 = result['range_1_5m']
-            r65 = result['range_6_5m']
+            probe_num = result.probe_num
+            r25 = result.range_2_5m
+            r15 = result.range_1_5m
+            r65 = result.range_6_5m
             
             print(f"{probe_num:<6} "
                   f"{r25['energy']}/{r25['time']}/{r25['threshold']:<15} "
@@ -314,7 +492,8 @@ class KS236EnergyReader:
         print(f"Success Rate: {successful_probes}/{total_probes} ({successful_probes/total_probes*100:.1f}%)")
         
         if failed_probes > 0:
-            failed_nums = [i for i in range(1, 10) if i not in [r['probe_num'] for r in results]]
+            read_nums = {r.probe_num for r in results}
+            failed_nums = [i for i in range(1, 10) if i not in read_nums]
             print(f"Failed Probes: {', '.join(map(str, failed_nums))}")
         
         print("\nParameter Legend:")
@@ -323,6 +502,11 @@ class KS236EnergyReader:
         print("  Th = Threshold (0-3, lower = longer range)")
 
 
+if _ks236_fast is not None:
+    # Used by _read_exactly for the running BCC of every received chunk
+    KS236EnergyReader.calculate_bcc = staticmethod(_ks236_fast.calculate_bcc)
+
+
 def main():
     """Main function with command line interface"""
     parser = argparse.ArgumentParser(
@@ -362,13 +546,21 @@ Examples:
         help='Suppress detailed output, show only summary'
     )
     
+    parser.add_argument(
+        '--rs485',
+        action='store_true',
+        help='Use kernel RS485 mode (RTS toggled by the driver) and skip the inter-probe delay'
+    )
+    
     args = parser.parse_args()
     
     # Create reader instance
     reader = KS236EnergyReader(
         device_path=args.device,
         baudrate=args.baudrate,
-        timeout=args.timeout
+        timeout=args.timeout,
+        quiet=args.quiet,
+        rs485=args.rs485
     )
     
     # Read all probes
@@ -24,9 +24,16 @@ Date: 2025-06-30
 
 import serial
 import time
+import asyncio
 import argparse
 import sys
-from typing import Optional, Dict, Any
+import struct
+from typing import Optional, Dict, Any, List
+
+try:
+    import serial_asyncio  # Optional, only needed by AsyncKS236EnergySetter
+except ImportError:
+    serial_asyncio = None
 
 class KS236EnergySetter:
     """KS236 ultrasonic probe energy parameter setter"""
@@ -35,24 +42,24 @@ class KS236EnergySetter:
     ADDR_CODE = 0xE8
     CMD_CODE = 0x99
     
-    # Probe parameter mappings
-    PROBE_TEMP_PARAMS = {  # Temporary modification (0xB1-0xBC)
-        1: 0xB1, 2: 0xB2, 3: 0xB3, 4: 0xB4, 5: 0xB5,
-        6: 0xB6, 7: 0xB7, 8: 0xB8, 9: 0xB9, 10: 0xBA,
-        11: 0xBB, 12: 0xBC
-    }
+    # Probe parameter mappings, indexed by probe number (index 0 unused)
+    PROBE_TEMP_PARAMS = (  # Temporary modification (0xB1-0xBC)
+        0x00,
+        0xB1, 0xB2, 0xB3, 0xB4, 0xB5, 0xB6,
+        0xB7, 0xB8, 0xB9, 0xBA, 0xBB, 0xBC
+    )
     
-    PROBE_PERM_PARAMS = {  # Permanent modification (0x71-0x7C)
-        1: 0x71, 2: 0x72, 3: 0x73, 4: 0x74, 5: 0x75,
-        6: 0x76, 7: 0x77, 8: 0x78, 9: 0x79, 10: 0x7A,
-        11: 0x7B, 12: 0x7C
-    }
+    PROBE_PERM_PARAMS = (  # Permanent modification (0x71-0x7C)
+        0x00,
+        0x71, 0x72, 0x73, 0x74, 0x75, 0x76,
+        0x77, 0x78, 0x79, 0x7A, 0x7B, 0x7C
+    )
     
-    PROBE_QUERY_PARAMS = {  # Query parameters (0xD1-0xDC)
-        1: 0xD1, 2: 0xD2, 3: 0xD3, 4: 0xD4, 5: 0xD5,
-        6: 0xD6, 7: 0xD7, 8: 0xD8, 9: 0xD9, 10: 0xDA,
-        11: 0xDB, 12: 0xDC
-    }
+    PROBE_QUERY_PARAMS = (  # Query parameters (0xD1-0xDC)
+        0x00,
+        0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6,
+        0xD7, 0xD8, 0xD9, 0xDA, 0xDB, 0xDC
+    )
     
     # Range mappings
     RANGE_NAMES = {
@@ -70,6 +77,13 @@ class KS236EnergySetter:
     
     FIXED_PARAMS = (0x2C, 0x40)
     
+    # 14-byte command padded to two little-endian 64-bit lanes for the BCC fold
+    _BCC_LANES_16 = struct.Struct('<QQ').unpack
+    
+    # Parameters are handled as a 9-byte record laid out like the frame body:
+    # (energy, time, threshold) for each range, in RANGE_NAMES order
+    _RANGE_INDEX = {2.5: 0, 1.5: 1, 6.5: 2}
+    
     def __init__(self, device_path: str = '/dev/ttyUS', baudrate: int = 115200, timeout: int = 3):
         """
         Initialize the KS236 energy setter
@@ -84,12 +98,53 @@ class KS236EnergySetter:
         self.timeout = timeout
         self.serial_port = None
         
+        # Query frames depend only on the probe number, so build them once;
+        # indexed by probe_num - 1
+        self._query_frames = tuple(
+            bytes([self.ADDR_CODE, self.CMD_CODE, param,
+                   self.ADDR_CODE ^ self.CMD_CODE ^ param])
+            for param in self.PROBE_QUERY_PARAMS[1:]
+        )
+        
+        # Set command buffer: only the probe param, the nine values and the
+        # BCC change between calls
+        self._set_frame = bytearray(15)
+        self._set_frame[0] = self.ADDR_CODE
+        self._set_frame[1] = self.CMD_CODE
+        self._set_frame[12:14] = bytes(self.FIXED_PARAMS)
+        
     def calculate_bcc(self, data: bytes) -> int:
         """Calculate BCC checksum (XOR of all bytes)"""
-        bcc = 0
-        for byte in data:
-            bcc ^= byte
-        return bcc
+        # XOR the data as 64-bit lanes, then fold the lane 64 -> 32 -> 16 -> 8
+        padded = bytes(data) + b'\x00' * (-len(data) % 8)
+        if len(padded) == 16:
+            low, high = self._BCC_LANES_16(padded)
+            acc = low ^ high
+        else:
+            acc = 0
+            for lane in struct.unpack(f'<{len(padded) // 8}Q', padded):
+                acc ^= lane
+        acc ^= acc >> 32
+        acc ^= acc >> 16
+        acc ^= acc >> 8
+        return acc & 0xFF
+    
+    def validate_response(self, response: bytes, probe_num: int) -> bool:
+        """
+        Validate a query response's header, probe parameter and checksum
+        
+        Args:
+            response: Response bytes received
+            probe_num: Probe number the response should belong to
+            
+        Returns:
+            True if response is valid
+        """
+        return (len(response) == 15
+                and response[0] == self.ADDR_CODE
+                and response[1] == self.CMD_CODE
+                and response[2] == self.PROBE_QUERY_PARAMS[probe_num]
+                and response[14] == self.calculate_bcc(response[:14]))
     
     def connect(self) -> bool:
         """Establish serial connection"""
@@ -101,7 +156,7 @@ class KS236EnergySetter:
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE,
                 timeout=self.timeout,
-                write_timeout=1
+                write_timeout=0.1
             )
             print(f"✓ Connected to {self.device_path} at {self.baudrate} baud")
             return True
@@ -115,7 +170,7 @@ class KS236EnergySetter:
             self.serial_port.close()
             print("✓ Serial connection closed")
     
-    def read_probe_params(self, probe_num: int) -> Optional[Dict[str, int]]:
+    def read_probe_params(self, probe_num: int) -> Optional[bytearray]:
         """
         Read current probe parameters
         
@@ -123,16 +178,13 @@ class KS236EnergySetter:
             probe_num: Probe number (1-12)
             
         Returns:
-            Dictionary with current parameters or None if failed
+            9-byte record of current parameters or None if failed
         """
-        if probe_num not in self.PROBE_QUERY_PARAMS:
+        if not 1 <= probe_num <= 12:
             print(f"✗ Invalid probe number: {probe_num}")
             return None
         
-        # Create query command
-        param = self.PROBE_QUERY_PARAMS[probe_num]
-        bcc = self.ADDR_CODE ^ self.CMD_CODE ^ param
-        command = bytes([self.ADDR_CODE, self.CMD_CODE, param, bcc])
+        command = self._query_frames[probe_num - 1]
         
         try:
             # Send query
@@ -140,19 +192,13 @@ class KS236EnergySetter:
             self.serial_port.write(command)
             self.serial_port.flush()
             
-            time.sleep(0.2)
-            
-            # Read response
+            # Blocking read returns as soon as the full frame has arrived
             response = self.serial_port.read(15)
             
             if len(response) == 15:
                 # Validate response
                 if response[0] == self.ADDR_CODE and response[1] == self.CMD_CODE:
-                    return {
-                        'energy1': response[3], 'time1': response[4], 'threshold1': response[5],
-                        'energy2': response[6], 'time2': response[7], 'threshold2': response[8],
-                        'energy3': response[9], 'time3': response[10], 'threshold3': response[11]
-                    }
+                    return bytearray(response[3:12])
             
             print(f"✗ Invalid response from probe {probe_num}")
             return None
@@ -161,6 +207,56 @@ class KS236EnergySetter:
             print(f"✗ Error reading probe {probe_num}: {e}")
             return None
     
+    def read_all_probes(self, probes: List[int]) -> Dict[int, bytearray]:
+        """
+        Read parameters of several probes in one pipelined exchange
+        
+        All query frames are written back-to-back and the responses are read
+        as one block, instead of a full query/read cycle per probe.
+        
+        Args:
+            probes: Probe numbers (1-12)
+            
+        Returns:
+            Dictionary mapping probe number to its 9-byte record; probes that
+            did not answer with a valid frame are left out
+        """
+        probes = [n for n in dict.fromkeys(probes) if 1 <= n <= 12]
+        if not probes:
+            return {}
+        
+        probe_by_param = {self.PROBE_QUERY_PARAMS[n]: n for n in probes}
+        results = {}
+        
+        try:
+            self.serial_port.reset_input_buffer()
+            self.serial_port.write(b''.join(self._query_frames[n - 1] for n in probes))
+            self.serial_port.flush()
+            
+            response = self.serial_port.read(15 * len(probes))
+        except Exception as e:
+            print(f"✗ Error reading probes: {e}")
+            return results
+        
+        # Walk the buffer frame by frame, resyncing on the next header
+        # whenever a frame does not validate
+        header = bytes([self.ADDR_CODE, self.CMD_CODE])
+        pos = response.find(header)
+        while 0 <= pos <= len(response) - 15:
+            frame = response[pos:pos + 15]
+            probe_num = probe_by_param.get(frame[2])
+            if probe_num is not None and self.validate_response(frame, probe_num):
+                results[probe_num] = bytearray(frame[3:12])
+                pos = response.find(header, pos + 15)
+            else:
+                pos = response.find(header, pos + 1)
+        
+        for probe_num in probes:
+            if probe_num not in results:
+                print(f"✗ Invalid response from probe {probe_num}")
+        
+        return results
+    
     def set_probe_params(self, probe_num: int, energy1: int, time1: int, threshold1: int,
                         energy2: int, time2: int, threshold2: int,
                         energy3: int, time3: int, threshold3: int,
@@ -177,44 +273,33 @@ class KS236EnergySetter:
         Returns:
             True if setting successful
         """
-        if probe_num not in self.PROBE_TEMP_PARAMS:
-            print(f"✗ Invalid probe number: {probe_num}")
-            return False
+        return self.set_probe_params_raw(
+            probe_num,
+            (energy1, time1, threshold1,
+             energy2, time2, threshold2,
+             energy3, time3, threshold3),
+            permanent=permanent, max_retries=max_retries
+        )
+    
+    def set_probe_params_raw(self, probe_num: int, values, permanent: bool = False,
+                             max_retries: int = 3) -> bool:
+        """
+        Set probe energy parameters from a 9-byte record
         
-        # Validate parameter ranges
-        if not (0 <= energy1 <= 7 and 0 <= energy2 <= 7 and 0 <= energy3 <= 7):
-            print("✗ Energy values must be in range 0-7")
-            return False
-        if not (0 <= time1 <= 7 and 0 <= time2 <= 7 and 0 <= time3 <= 7):
-            print("✗ Time values must be in range 0-7")
-            return False
-        if not (0 <= threshold1 <= 3 and 0 <= threshold2 <= 3 and 0 <= threshold3 <= 3):
-            print("✗ Threshold values must be in range 0-3")
+        Args:
+            probe_num: Probe number (1-12)
+            values: (energy, time, threshold) for the 2.5m, 1.5m and 6.5m
+                ranges, as returned by read_probe_params
+            permanent: True for permanent modification, False for temporary
+            max_retries: Maximum retry attempts
+            
+        Returns:
+            True if setting successful
+        """
+        full_command = self._prepare_set_command(probe_num, values, permanent)
+        if full_command is None:
             return False
         
-        # Select probe parameter code
-        probe_params = self.PROBE_PERM_PARAMS if permanent else self.PROBE_TEMP_PARAMS
-        param1 = probe_params[probe_num]
-        
-        # Create command
-        command = bytes([
-            self.ADDR_CODE, self.CMD_CODE, param1,
-            energy1, time1, threshold1,
-            energy2, time2, threshold2,
-            energy3, time3, threshold3,
-            self.FIXED_PARAMS[0], self.FIXED_PARAMS[1]
-        ])
-        
-        # Calculate BCC
-        bcc = self.calculate_bcc(command)
-        full_command = command + bytes([bcc])
-        
-        print(f"Setting probe {probe_num} ({'permanent' if permanent else 'temporary'}):")
-        print(f"  Command: {' '.join(f'{b:02X}' for b in full_command)}")
-        print(f"  2.5m range: E{energy1}/T{time1}/Th{threshold1}")
-        print(f"  1.5m range: E{energy2}/T{time2}/Th{threshold2}")
-        print(f"  6.5m range: E{energy3}/T{time3}/Th{threshold3}")
-        
         # Send command with retries
         for attempt in range(max_retries):
             try:
@@ -224,44 +309,171 @@ class KS236EnergySetter:
                 
                 if bytes_sent != len(full_command):
                     print(f"Warning: Only sent {bytes_sent}/{len(full_command)} bytes")
-                    continue
-                
-                time.sleep(0.5)
-                
-                # Read response (expect 5 bytes)
-                response = self.serial_port.read(5)
-                
-                if len(response) >= 5:
-                    if response[0] == self.ADDR_CODE and response[1] == self.CMD_CODE:
-                        status = response[3]
-                        if status == 0x00:
-                            print("✓ Setting successful")
-                            return True
-                        elif status == 0x02:
-                            print("✗ Parameter error")
-                            return False
-                        elif status == 0xFF:
-                            print("✗ Setting failed")
-                            return False
-                        else:
-                            print(f"✗ Unknown status: 0x{status:02X}")
-                    else:
-                        print("✗ Invalid response format")
+                    fail_reason = 'short_write'
                 else:
-                    print(f"✗ Invalid response length: {len(response)} bytes")
-                
-                if attempt < max_retries - 1:
-                    print(f"Retrying... (attempt {attempt + 2}/{max_retries})")
-                    time.sleep(0.3)
+                    # Read response (expect 5 bytes); returns once the ack arrives
+                    # so the timeout only bounds a silent or slow EEPROM write
+                    response = self.serial_port.read(5)
+                    
+                    result = self._check_set_response(response)
+                    if result is not None:
+                        return result
+                    fail_reason = 'no_response' if not response else 'bad_response'
                     
             except Exception as e:
                 print(f"Error on attempt {attempt + 1}: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(0.3)
+                fail_reason = 'error'
+            
+            if attempt < max_retries - 1:
+                print(f"Retrying... (attempt {attempt + 2}/{max_retries})")
+                time.sleep(self._retry_delay(attempt, fail_reason))
         
         print(f"✗ Failed to set probe {probe_num} after {max_retries} attempts")
         return False
     
+    @staticmethod
+    def _retry_delay(attempt: int, fail_reason: str) -> float:
+        """
+        Delay before the next set attempt
+        
+        A short write is a local problem and is retried at once; anything
+        that involved the device backs off exponentially from 5 ms, capped
+        at 200 ms, so a briefly busy probe is retried quickly.
+        """
+        if fail_reason == 'short_write':
+            return 0.0
+        return min(0.005 * (1 << attempt), 0.2)
+    
+    def _prepare_set_command(self, probe_num: int, values,
+                             permanent: bool) -> Optional[bytearray]:
+        """
+        Validate a 9-byte record and fill the set command buffer with it
+        
+        Returns:
+            The filled command buffer, or None if the arguments are invalid
+        """
+        if not 1 <= probe_num <= 12:
+            print(f"✗ Invalid probe number: {probe_num}")
+            return None
+        if len(values) != 9:
+            print(f"✗ Expected 9 parameter values, got {len(values)}")
+            return None
+        
+        # Validate parameter ranges: energy/time fit in 3 bits, threshold in 2;
+        # a negative int has high bits set, so it fails the mask as well
+        e1, t1, th1, e2, t2, th2, e3, t3, th3 = values
+        if (e1 | e2 | e3 | t1 | t2 | t3) & ~0x07:
+            print("✗ Energy and time values must be in range 0-7")
+            return None
+        if (th1 | th2 | th3) & ~0x03:
+            print("✗ Threshold values must be in range 0-3")
+            return None
+        
+        # Select probe parameter code
+        probe_params = self.PROBE_PERM_PARAMS if permanent else self.PROBE_TEMP_PARAMS
+        
+        # Fill in the command buffer and its BCC
+        full_command = self._set_frame
+        full_command[2] = probe_params[probe_num]
+        full_command[3:12] = values
+        full_command[14] = self.calculate_bcc(full_command[:14])
+        
+        print(f"Setting probe {probe_num} ({'permanent' if permanent else 'temporary'}):")
+        print(f"  Command: {' '.join(f'{b:02X}' for b in full_command)}")
+        self._print_ranges(values)
+        
+        return full_command
+    
+    def _check_set_response(self, response: bytes) -> Optional[bool]:
+        """
+        Interpret a set acknowledgement
+        
+        Returns:
+            True on success, False if the probe rejected the command,
+            None if the response was unusable and the command should be retried
+        """
+        if len(response) >= 5:
+            if response[0] != self.ADDR_CODE or response[1] != self.CMD_CODE:
+                print("✗ Invalid response format")
+            elif response[4] != self.calculate_bcc(response[:4]):
+                print("✗ Response checksum mismatch")
+            else:
+                status = response[3]
+                if status == 0x00:
+                    print("✓ Setting successful")
+                    return True
+                elif status == 0x02:
+                    print("✗ Parameter error")
+                    return False
+                elif status == 0xFF:
+                    print("✗ Setting failed")
+                    return False
+                else:
+                    print(f"✗ Unknown status: 0x{status:02X}")
+        else:
+            print(f"✗ Invalid response length: {len(response)} bytes")
+        return None
+    
+    def set_probes_bulk(self, rows, permanent: bool = False) -> Dict[int, bool]:
+        """
+        Set parameters of several probes in one call
+        
+        Every row is validated before anything is sent. The frames are then
+        written one at a time, each waiting for its own acknowledgement, so a
+        probe's reply never collides with the host still transmitting on the
+        half-duplex bus.
+        
+        Args:
+            rows: Sequences of [probe_num, e1, t1, th1, e2, t2, th2, e3, t3, th3]
+            permanent: True for permanent modification, False for temporary
+            
+        Returns:
+            Dictionary mapping probe number to whether its setting succeeded;
+            empty if any row was invalid and nothing was sent
+        """
+        rows = [tuple(row) for row in rows]
+        if not rows:
+            return {}
+        
+        # Validate every row up front, OR-ing the fields together so the
+        # range check is one mask test per field group
+        seen = set()
+        energy_time = threshold = 0
+        for row in rows:
+            if len(row) != 10:
+                print(f"✗ Expected 10 values per row, got {len(row)}")
+                return {}
+            probe_num = row[0]
+            if not 1 <= probe_num <= 12 or probe_num in seen:
+                print(f"✗ Invalid or duplicate probe number: {probe_num}")
+                return {}
+            seen.add(probe_num)
+            energy_time |= row[1] | row[2] | row[4] | row[5] | row[7] | row[8]
+            threshold |= row[3] | row[6] | row[9]
+        if energy_time & ~0x07:
+            print("✗ Energy and time values must be in range 0-7")
+            return {}
+        if threshold & ~0x03:
+            print("✗ Threshold values must be in range 0-3")
+            return {}
+        
+        print(f"Setting {len(rows)} probes ({'permanent' if permanent else 'temporary'})...")
+        
+        results = {}
+        for row in rows:
+            results[row[0]] = self.set_probe_params_raw(row[0], row[1:], permanent=permanent)
+        
+        for probe_num, ok in results.items():
+            print(f"  {'✓' if ok else '✗'} Probe {probe_num}")
+        
+        return results
+    
+    def _print_ranges(self, values) -> None:
+        """Print a 9-byte parameter record as one line per range"""
+        for i, name in enumerate(self.RANGE_NAMES.values()):
+            energy, time_val, threshold = values[3 * i:3 * i + 3]
+            print(f"  {name} range: E{energy}/T{time_val}/Th{threshold}")
+    
     def set_range_energy(self, probe_num: int, range_m: float, energy: int, 
                         time_val: Optional[int] = None, threshold: Optional[int] = None,
                         permanent: bool = False, verify: bool = True) -> bool:
@@ -292,42 +504,21 @@ class KS236EnergySetter:
             return False
         
         print(f"Current parameters:")
-        print(f"  2.5m range: E{current['energy1']}/T{current['time1']}/Th{current['threshold1']}")
-        print(f"  1.5m range: E{current['energy2']}/T{current['time2']}/Th{current['threshold2']}")
-        print(f"  6.5m range: E{current['energy3']}/T{current['time3']}/Th{current['threshold3']}")
+        self._print_ranges(current)
         
         # Prepare new parameters
-        new_params = current.copy()
-        
-        if range_m == 2.5:
-            new_params['energy1'] = energy
-            if time_val is not None:
-                new_params['time1'] = time_val
-            if threshold is not None:
-                new_params['threshold1'] = threshold
-        elif range_m == 1.5:
-            new_params['energy2'] = energy
-            if time_val is not None:
-                new_params['time2'] = time_val
-            if threshold is not None:
-                new_params['threshold2'] = threshold
-        elif range_m == 6.5:
-            new_params['energy3'] = energy
-            if time_val is not None:
-                new_params['time3'] = time_val
-            if threshold is not None:
-                new_params['threshold3'] = threshold
+        new_params = current[:]
+        base = self._RANGE_INDEX[range_m] * 3
+        new_params[base] = energy
+        if time_val is not None:
+            new_params[base + 1] = time_val
+        if threshold is not None:
+            new_params[base + 2] = threshold
         
         print(f"\nSetting {self.RANGE_NAMES[range_m]} range energy to {energy}...")
         
         # Set parameters
-        success = self.set_probe_params(
-            probe_num,
-            new_params['energy1'], new_params['time1'], new_params['threshold1'],
-            new_params['energy2'], new_params['time2'], new_params['threshold2'],
-            new_params['energy3'], new_params['time3'], new_params['threshold3'],
-            permanent=permanent
-        )
+        success = self.set_probe_params_raw(probe_num, new_params, permanent=permanent)
         
         if success and verify:
             print(f"\nVerifying changes...")
@@ -336,19 +527,11 @@ class KS236EnergySetter:
             updated = self.read_probe_params(probe_num)
             if updated:
                 print(f"Updated parameters:")
-                print(f"  2.5m range: E{updated['energy1']}/T{updated['time1']}/Th{updated['threshold1']}")
-                print(f"  1.5m range: E{updated['energy2']}/T{updated['time2']}/Th{updated['threshold2']}")
-                print(f"  6.5m range: E{updated['energy3']}/T{updated['time3']}/Th{updated['threshold3']}")
+                self._print_ranges(updated)
                 
                 # Check if change was applied
-                if range_m == 2.5 and updated['energy1'] == energy:
-                    print(f"🎉 Successfully set 2.5m energy to {energy}")
-                    return True
-                elif range_m == 1.5 and updated['energy2'] == energy:
-                    print(f"🎉 Successfully set 1.5m energy to {energy}")
-                    return True
-                elif range_m == 6.5 and updated['energy3'] == energy:
-                    print(f"🎉 Successfully set 6.5m energy to {energy}")
+                if updated[base] == energy:
+                    print(f"🎉 Successfully set {self.RANGE_NAMES[range_m]} energy to {energy}")
                     return True
                 else:
                     print(f"⚠️ Setting command succeeded but energy value not updated")
@@ -360,6 +543,135 @@ class KS236EnergySetter:
         return success
 
 
+class AsyncKS236EnergySetter(KS236EnergySetter):
+    """
+    asyncio variant of KS236EnergySetter built on pyserial-asyncio
+    
+    Response timeouts are enforced with asyncio.wait_for instead of a
+    blocking read, so waiting on a silent probe does not hold a thread and
+    several adapters can be driven from one event loop. Frame building,
+    validation and ack handling are shared with the synchronous class.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._reader = None
+        self._writer = None
+    
+    async def connect_async(self) -> bool:
+        """Open the serial port as an asyncio stream pair"""
+        if serial_asyncio is None:
+            print("✗ pyserial-asyncio is not installed (pip install pyserial-asyncio)")
+            return False
+        try:
+            self._reader, self._writer = await serial_asyncio.open_serial_connection(
+                url=self.device_path,
+                baudrate=self.baudrate,
+                bytesize=serial.EIGHTBITS,
+                parity=serial.PARITY_NONE,
+                stopbits=serial.STOPBITS_ONE
+            )
+            print(f"✓ Connected to {self.device_path} at {self.baudrate} baud")
+            return True
+        except serial.SerialException as e:
+            print(f"✗ Failed to connect to {self.device_path}: {e}")
+            return False
+    
+    async def disconnect_async(self):
+        """Close the serial stream"""
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+            print("✓ Serial connection closed")
+    
+    async def _discard_pending(self):
+        """Drop bytes left over from a timed-out or malformed exchange"""
+        while not self._reader.at_eof():
+            try:
+                if not await asyncio.wait_for(self._reader.read(256), timeout=0.01):
+                    return  # EOF: nothing more will arrive
+            except asyncio.TimeoutError:
+                return
+    
+    async def _exchange(self, command: bytes, size: int) -> bytes:
+        """Send a command and wait for exactly size response bytes"""
+        self._writer.write(command)
+        await self._writer.drain()
+        return await asyncio.wait_for(self._reader.readexactly(size), timeout=self.timeout)
+    
+    async def read_probe_params_async(self, probe_num: int) -> Optional[bytearray]:
+        """
+        Read current probe parameters
+        
+        Args:
+            probe_num: Probe number (1-12)
+            
+        Returns:
+            9-byte record of current parameters or None if failed
+        """
+        if not 1 <= probe_num <= 12:
+            print(f"✗ Invalid probe number: {probe_num}")
+            return None
+        
+        try:
+            response = await self._exchange(self._query_frames[probe_num - 1], 15)
+            if response[0] == self.ADDR_CODE and response[1] == self.CMD_CODE:
+                return bytearray(response[3:12])
+            print(f"✗ Invalid response from probe {probe_num}")
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            print(f"✗ Invalid response from probe {probe_num}")
+        except Exception as e:
+            print(f"✗ Error reading probe {probe_num}: {e}")
+        
+        await self._discard_pending()
+        return None
+    
+    async def set_probe_params_raw_async(self, probe_num: int, values,
+                                         permanent: bool = False,
+                                         max_retries: int = 3) -> bool:
+        """
+        Set probe energy parameters from a 9-byte record
+        
+        Args:
+            probe_num: Probe number (1-12)
+            values: (energy, time, threshold) for the 2.5m, 1.5m and 6.5m ranges
+            permanent: True for permanent modification, False for temporary
+            max_retries: Maximum retry attempts
+            
+        Returns:
+            True if setting successful
+        """
+        full_command = self._prepare_set_command(probe_num, values, permanent)
+        if full_command is None:
+            return False
+        full_command = bytes(full_command)
+        
+        for attempt in range(max_retries):
+            try:
+                response = await self._exchange(full_command, 5)
+            except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+                response = b''
+            except Exception as e:
+                print(f"Error on attempt {attempt + 1}: {e}")
+                response = None
+            
+            if response is not None:
+                result = self._check_set_response(response)
+                if result is not None:
+                    return result
+                fail_reason = 'no_response' if not response else 'bad_response'
+            else:
+                fail_reason = 'error'
+            
+            await self._discard_pending()
+            if attempt < max_retries - 1:
+                print(f"Retrying... (attempt {attempt + 2}/{max_retries})")
+                await asyncio.sleep(self._retry_delay(attempt, fail_reason))
+        
+        print(f"✗ Failed to set probe {probe_num} after {max_retries} attempts")
+        return False
+
+
 def main():
     """Main function with command line interface"""
     parser = argparse.ArgumentParser(
@@ -26,9 +26,110 @@ Date: 2025-06-30
 
 import serial
 import time
+import asyncio
 import argparse
+import json
+import os
+import select
+import stat
 import sys
-from typing import Optional, Dict, List, Any
+import struct
+import threading
+from functools import reduce
+from operator import xor
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Optional, Dict, List, Any, Tuple
+
+try:
+    import serial_asyncio  # Optional, only needed by AsyncKS236PValueReader
+except ImportError:
+    serial_asyncio = None
+
+# '0x00'..'0xFF', indexed by byte value
+_HEX_LUT = tuple(f'0x{i:02X}' for i in range(256))
+
+# P1-P17 start at byte 3 of a response
+_UNPACK_P_VALUES = struct.Struct('17B').unpack_from
+
+@dataclass
+class ProbeResult:
+    """P values read from one probe; display fields are built on first use"""
+    
+    probe_num: int
+    response: bytes
+    replicated_from: Optional[int] = None  # Set when inferred rather than queried
+    
+    @property
+    def inferred(self) -> bool:
+        """True if the probe was not queried and its P values were copied (--fast)"""
+        return self.replicated_from is not None
+    
+    @property
+    def p_values(self) -> bytes:
+        """Raw P1-P17 bytes"""
+        return self.response[3:20]
+    
+    @cached_property
+    def p_ints(self) -> Tuple[int, ...]:
+        """P1-P17 as a tuple of ints, unpacked in one call"""
+        return _UNPACK_P_VALUES(self.response, 3)
+    
+    @cached_property
+    def probe_id(self) -> str:
+        return _HEX_LUT[self.response[2]]
+    
+    @cached_property
+    def bcc(self) -> str:
+        # Inferred results never crossed the bus, so they carry no checksum
+        return '' if self.inferred else _HEX_LUT[self.response[20]]
+    
+    @cached_property
+    def raw_response(self) -> str:
+        return '' if self.inferred else self.response.hex(' ').upper()
+    
+    @cached_property
+    def main_phase_params(self) -> Dict[str, Dict[str, Any]]:
+        names = KS236PValueReader._P_NAMES
+        descriptions = KS236PValueReader._P_DESC_BY_IDX
+        return {
+            names[i]: {
+                'value': value,
+                'hex': _HEX_LUT[value],
+                'range': descriptions[i]
+            }
+            for i, value in enumerate(self.p_ints[:12])
+        }
+    
+    @cached_property
+    def auxiliary_params(self) -> Dict[str, Dict[str, Any]]:
+        names = KS236PValueReader._P_NAMES
+        descriptions = KS236PValueReader._P_DESC_BY_IDX
+        defaults = KS236PValueReader._AUX_DEFAULT_BY_IDX
+        return {
+            names[i]: {
+                'value': value,
+                'hex': _HEX_LUT[value],
+                'description': descriptions[i],
+                'default': _HEX_LUT[defaults[i]],
+                'is_default': value == defaults[i]
+            }
+            for i, value in enumerate(self.p_ints[12:], 12)
+        }
+    
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the parsed probe data as a plain dictionary"""
+        return {
+            'probe_num': self.probe_num,
+            'probe_id': self.probe_id,
+            'p_values': self.p_values,
+            'main_phase_params': self.main_phase_params,
+            'auxiliary_params': self.auxiliary_params,
+            'bcc': self.bcc,
+            'raw_response': self.raw_response,
+            'inferred': self.inferred
+        }
 
 class KS236PValueReader:
     """KS236 ultrasonic probe P-value parameter reader"""
@@ -41,6 +142,10 @@ class KS236PValueReader:
         6: 0xE6, 7: 0xE7, 8: 0xE8, 9: 0xE9
     }
     EXPECTED_RESPONSE_LENGTH = 21
+    INTER_BYTE_TIMEOUT = 0.05  # Give up on a frame that stalls mid-way
+    
+    # Checksummed part of a response (20 bytes) as two 64-bit lanes and one 32-bit lane
+    _BCC_LANES_20 = struct.Struct('<QQI').unpack
     
     # P-value descriptions and distance ranges
     P_DESCRIPTIONS = {
@@ -68,7 +173,13 @@ class KS236PValueReader:
         'P13': 0x00, 'P14': 0x03, 'P15': 0x01, 'P16': 0x00, 'P17': 0x01
     }
     
-    def __init__(self, device_path: str = '/dev/ttyUS', baudrate: int = 115200, timeout: int = 3):
+    # The tables above indexed by P position (0 = P1); -1 marks no default
+    _P_NAMES = tuple(P_DESCRIPTIONS)
+    _P_DESC_BY_IDX = tuple(P_DESCRIPTIONS.values())
+    _AUX_DEFAULT_BY_IDX = (-1,) * 12 + tuple(DEFAULT_AUX_VALUES.values())
+    
+    def __init__(self, device_path: str = '/dev/ttyUS', baudrate: int = 115200, timeout: int = 3,
+                 fast: bool = False):
         """
         Initialize the KS236 P-value reader
         
@@ -76,11 +187,28 @@ class KS236PValueReader:
             device_path: Serial device path
             baudrate: Communication baudrate
             timeout: Read timeout in seconds
+            fast: Once the first two probes on a bus report identical P values,
+                assume the remaining probes on that bus match instead of
+                querying them
         """
         self.device_path = device_path
         self.baudrate = baudrate
         self.timeout = timeout
+        self.fast = fast
         self.serial_port = None
+        self._bus_ports = {}
+        self._rx_buffers = {}
+        
+        # Query commands and response headers depend only on the probe
+        # number, so build them once
+        self._prefixes = {
+            probe_num: bytes([self.ADDR_CODE, self.CMD_CODE, param])
+            for probe_num, param in self.PROBE_PARAMS.items()
+        }
+        self._commands = {
+            probe_num: prefix + bytes([self.ADDR_CODE ^ self.CMD_CODE ^ prefix[2]])
+            for probe_num, prefix in self._prefixes.items()
+        }
         
     def calculate_bcc(self, data: bytes) -> int:
         """
@@ -92,10 +220,15 @@ class KS236PValueReader:
         Returns:
             BCC checksum value
         """
-        bcc = 0
-        for byte in data:
-            bcc ^= byte
-        return bcc
+        if len(data) == 20:
+            # XOR the lanes together, then fold the result 64 -> 32 -> 16 -> 8
+            low, high, tail = self._BCC_LANES_20(data)
+            acc = low ^ high ^ tail
+            acc ^= acc >> 32
+            acc ^= acc >> 16
+            acc ^= acc >> 8
+            return acc & 0xFF
+        return reduce(xor, data, 0)
     
     def create_query_command(self, probe_num: int) -> bytes:
         """
@@ -113,10 +246,7 @@ class KS236PValueReader:
         if probe_num not in self.PROBE_PARAMS:
             raise ValueError(f"Invalid probe number: {probe_num}. Must be 1-9.")
         
-        param = self.PROBE_PARAMS[probe_num]
-        bcc = self.ADDR_CODE ^ self.CMD_CODE ^ param
-        
-        return bytes([self.ADDR_CODE, self.CMD_CODE, param, bcc])
+        return self._commands[probe_num]
     
     def validate_response(self, response: bytes, expected_probe_num: int) -> bool:
         """
@@ -132,97 +262,64 @@ class KS236PValueReader:
         if len(response) != self.EXPECTED_RESPONSE_LENGTH:
             return False
         
-        # Check address and command codes
-        if response[0] != self.ADDR_CODE or response[1] != self.CMD_CODE:
+        # Check address, command code and probe parameter in one compare
+        if not response.startswith(self._prefixes[expected_probe_num]):
             return False
         
-        # Check probe parameter
-        expected_param = self.PROBE_PARAMS[expected_probe_num]
-        if response[2] != expected_param:
-            return False
-        
-        # Validate BCC checksum
+        # Validate BCC checksum last, it is the most expensive check
         expected_bcc = self.calculate_bcc(response[:-1])
         if response[-1] != expected_bcc:
             return False
         
         return True
     
-    def parse_response(self, response: bytes, probe_num: int) -> Dict[str, Any]:
+    def parse_response(self, response: bytes, probe_num: int) -> ProbeResult:
         """
-        Parse response data into structured format
+        Wrap a validated response; display fields are parsed on first access
         
         Args:
             response: Response bytes
             probe_num: Probe number
             
         Returns:
-            Dictionary with parsed P-value parameters
+            ProbeResult for the probe
         """
-        p_values = response[3:20]  # P1-P17 are bytes 3-19
-        
-        result = {
-            'probe_num': probe_num,
-            'probe_id': f"0x{response[2]:02X}",
-            'main_phase_params': {},
-            'auxiliary_params': {},
-            'bcc': f"0x{response[20]:02X}",
-            'raw_response': ' '.join(f'{b:02X}' for b in response)
-        }
-        
-        # Parse main phase parameters P1-P12
-        for i in range(12):
-            p_name = f'P{i+1}'
-            result['main_phase_params'][p_name] = {
-                'value': p_values[i],
-                'hex': f'0x{p_values[i]:02X}', 
-                'range': self.P_DESCRIPTIONS[p_name]
-            }
-        
-        # Parse auxiliary parameters P13-P17
-        for i in range(12, 17):
-            p_name = f'P{i+1}'
-            result['auxiliary_params'][p_name] = {
-                'value': p_values[i],
-                'hex': f'0x{p_values[i]:02X}',
-                'description': self.P_DESCRIPTIONS[p_name],
-                'default': f'0x{self.DEFAULT_AUX_VALUES[p_name]:02X}',
-                'is_default': p_values[i] == self.DEFAULT_AUX_VALUES[p_name]
-            }
-        
-        return result
+        # Copy: query_probe hands in the port's reusable receive buffer
+        return ProbeResult(probe_num, bytes(response))
     
-    def query_probe(self, probe_num: int, max_retries: int = 3) -> Optional[Dict[str, Any]]:
+    def query_probe(self, probe_num: int, max_retries: int = 3,
+                    port: Optional[serial.Serial] = None) -> Optional[ProbeResult]:
         """
         Query single probe with retry mechanism
         
         Args:
             probe_num: Probe number (1-9)
             max_retries: Maximum retry attempts
+            port: Serial port of the probe's bus (default: the reader's port)
             
         Returns:
             Parsed probe data or None if failed
         """
         command = self.create_query_command(probe_num)
+        port = port or self.serial_port
         
         for attempt in range(max_retries):
             try:
-                # Clear input buffer
-                self.serial_port.reset_input_buffer()
+                # Clear leftovers of a failed attempt; on the first attempt the
+                # inter-probe delay has already let the bus go quiet
+                if attempt > 0:
+                    port.reset_input_buffer()
                 
                 # Send command
-                bytes_sent = self.serial_port.write(command)
-                self.serial_port.flush()
+                bytes_sent = self._write_frame(port, command)
+                port.flush()
                 
                 if bytes_sent != len(command):
                     print(f"Warning: Probe {probe_num} attempt {attempt + 1} - only sent {bytes_sent}/{len(command)} bytes")
                     continue
                 
-                # Wait for response (recommended 100ms delay)
-                time.sleep(0.1 + attempt * 0.05)  # Progressive delay
-                
-                # Read response
-                response = self.serial_port.read(self.EXPECTED_RESPONSE_LENGTH)
+                # Read response; blocks only until the full frame has arrived
+                response = self._read_frame(port, self.EXPECTED_RESPONSE_LENGTH)
                 
                 if len(response) == self.EXPECTED_RESPONSE_LENGTH:
                     if self.validate_response(response, probe_num):
@@ -234,9 +331,10 @@ class KS236PValueReader:
                 else:
                     print(f"Warning: Probe {probe_num} attempt {attempt + 1} - no response")
                 
-                # Wait before retry
-                if attempt < max_retries - 1:
-                    time.sleep(0.2)
+                # A silent probe already cost a full read timeout; after a
+                # malformed frame give stragglers a moment before the buffer reset
+                if attempt < max_retries - 1 and len(response) > 0:
+                    time.sleep(0.01)
                     
             except Exception as e:
                 print(f"Error querying probe {probe_num} attempt {attempt + 1}: {e}")
@@ -245,70 +343,270 @@ class KS236PValueReader:
         
         return None
     
-    def connect(self) -> bool:
+    @staticmethod
+    def _write_frame(port: serial.Serial, command: bytes) -> int:
+        """
+        Write a query frame straight to the port's file descriptor
+        
+        A 4-byte frame always fits the TX buffer, so pyserial's write loop and
+        write-timeout bookkeeping add nothing on POSIX. Other platforms keep
+        Serial.write.
+        
+        Returns:
+            Number of bytes written
+        """
+        if os.name != 'posix':
+            return port.write(command)
+        return os.write(port.fileno(), command)
+    
+    def _read_frame(self, port: serial.Serial, size: int) -> bytearray:
+        """
+        Read one response frame into the port's reusable receive buffer
+        
+        Waits up to the read timeout for the reply to start, but gives up once
+        it stalls for INTER_BYTE_TIMEOUT, so a truncated frame does not hold
+        the bus for the full timeout. pyserial ignores inter_byte_timeout in
+        its POSIX read loop, hence the explicit select().
+        
+        Args:
+            port: Serial port to read from
+            size: Expected frame length
+            
+        Returns:
+            The receive buffer itself when the whole frame arrived (valid
+            until the next read on this port), otherwise a copy of the bytes
+            received
+        """
+        rx = self._rx_buffers.get(port)
+        if rx is None or len(rx) != size:
+            rx = self._rx_buffers[port] = bytearray(size)
+        view = memoryview(rx)
+        
+        if os.name != 'posix':
+            received = port.readinto(view)
+        else:
+            fd = port.fileno()
+            received = 0
+            wait = self.timeout
+            while received < size:
+                ready, _, _ = select.select([fd], [], [], wait)
+                if not ready:
+                    break
+                count = os.readv(fd, [view[received:]])
+                if not count:
+                    # Readable but empty means EOF/hangup, e.g. an unplugged
+                    # adapter; report it the way pyserial's read() does
+                    view.release()
+                    raise serial.SerialException(
+                        'device reports readiness to read but returned no data '
+                        '(device disconnected or multiple access on port?)')
+                received += count
+                wait = self.INTER_BYTE_TIMEOUT
+        
+        view.release()
+        return rx if received == size else rx[:received]
+    
+    def connect(self, device_path: Optional[str] = None) -> bool:
         """
         Establish serial connection
         
+        Args:
+            device_path: Serial device path (default: the reader's device)
+            
         Returns:
             True if connection successful
         """
+        device_path = device_path or self.device_path
         try:
-            self.serial_port = serial.Serial(
-                port=self.device_path,
+            port = serial.Serial(
+                port=device_path,
                 baudrate=self.baudrate,
                 bytesize=serial.EIGHTBITS,
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE,
                 timeout=self.timeout,
-                write_timeout=1
+                write_timeout=1,
+                exclusive=True  # Keep other processes from interleaving on the bus
             )
-            print(f"✓ Connected to {self.device_path} at {self.baudrate} baud")
+            self._set_ftdi_latency(device_path, 1)
+            self._bus_ports[device_path] = (port, threading.Lock())
+            if device_path == self.device_path:
+                self.serial_port = port
+            print(f"✓ Connected to {device_path} at {self.baudrate} baud")
             return True
         except serial.SerialException as e:
-            print(f"✗ Failed to connect to {self.device_path}: {e}")
+            print(f"✗ Failed to connect to {device_path}: {e}")
+            return False
+    
+    @staticmethod
+    def _set_ftdi_latency(device_path: str, latency_ms: int) -> bool:
+        """
+        Lower the USB-serial latency timer of an FTDI adapter (Linux only)
+        
+        FTDI chips hold short frames for the latency timer (16 ms by default)
+        before passing them to the host. This is best effort: it needs write
+        access to sysfs and is silently skipped for other adapters.
+        
+        Args:
+            device_path: Serial device path, udev symlinks are resolved
+            latency_ms: Latency timer in milliseconds
+            
+        Returns:
+            True if the latency timer was set
+        """
+        tty_name = os.path.basename(os.path.realpath(device_path))
+        sysfs_path = f"/sys/bus/usb-serial/devices/{tty_name}/latency_timer"
+        try:
+            with open(sysfs_path, 'w') as f:
+                f.write(str(latency_ms))
+            return True
+        except OSError:
             return False
     
     def disconnect(self):
-        """Close serial connection"""
-        if self.serial_port and self.serial_port.is_open:
-            self.serial_port.close()
-            print("✓ Serial connection closed")
+        """Close serial connections"""
+        for port, _ in self._bus_ports.values():
+            if port.is_open:
+                port.close()
+                print("✓ Serial connection closed")
+        self._bus_ports.clear()
+        self._rx_buffers.clear()
+        self.serial_port = None
+    
+    def _poll_bus(self, device_path: str, probe_nums: List[int],
+                  results: List[Optional[ProbeResult]], offset: int):
+        """Query the probes wired to one bus in order, filling results[offset:]"""
+        port, lock = self._bus_ports[device_path]
+        for index, probe_num in enumerate(probe_nums, offset):
+            if self.fast and index - offset >= 2:
+                first, second = results[offset], results[offset + 1]
+                if first and second and first.p_values == second.p_values:
+                    results[index] = self._replicate(first, probe_num)
+                    print(f"↺ Probe {probe_num}: Assumed identical to probe {first.probe_num} (--fast)")
+                    continue
+            
+            # The lock keeps each RS485 bus single-master
+            with lock:
+                print(f"Querying probe {probe_num}...")
+                result = self.query_probe(probe_num, port=port)
+                
+                if result:
+                    print(f"✓ Probe {probe_num}: Successfully read P values")
+                else:
+                    print(f"✗ Probe {probe_num}: Failed to read P values")
+            
+            results[index] = result
+            
+            # Inter-probe delay, outside the lock so the bus is free meanwhile
+            time.sleep(0.1)
     
-    def read_all_probes(self) -> List[Dict[str, Any]]:
+    def _replicate(self, source: ProbeResult, probe_num: int) -> ProbeResult:
+        """
+        Build a result for an unqueried probe from another probe's P values
+        
+        Only the header and P values are filled in; no response was received,
+        so the result has no checksum and an empty raw response.
+        """
+        return ProbeResult(probe_num, self._prefixes[probe_num] + source.p_values,
+                           replicated_from=source.probe_num)
+    
+    def read_all_probes(self, bus_groups: Optional[List[Tuple[str, List[int]]]] = None) -> List[ProbeResult]:
         """
         Read P values from all probes (1-9)
         
+        Args:
+            bus_groups: List of (device_path, probe_nums) pairs, one per RS485
+                adapter. Defaults to probes 1-9 on the reader's device.
+                Probes on different buses are polled concurrently.
+        
         Returns:
-            List of probe data dictionaries
+            List of probe results, in bus_groups order
         """
-        results = []
-        failed_probes = []
+        if bus_groups is None:
+            bus_groups = [(self.device_path, list(range(1, 10)))]
+        
+        for device_path in dict.fromkeys(path for path, _ in bus_groups):
+            if device_path not in self._bus_ports and not self.connect(device_path):
+                return []
+        
+        # One slot per probe so bus workers can write results without locking
+        results = [None] * sum(len(probe_nums) for _, probe_nums in bus_groups)
         
         print("Reading P values from probes 1-9...")
         print("=" * 60)
         
-        for probe_num in range(1, 10):
-            print(f"Querying probe {probe_num}...")
-            result = self.query_probe(probe_num)
-            
-            if result:
-                results.append(result)
-                print(f"✓ Probe {probe_num}: Successfully read P values")
-            else:
-                failed_probes.append(probe_num)
-                print(f"✗ Probe {probe_num}: Failed to read P values")
+        with ThreadPoolExecutor(max_workers=len(bus_groups)) as executor:
+            futures = []
+            offset = 0
+            for device_path, probe_nums in bus_groups:
+                futures.append(executor.submit(self._poll_bus, device_path, probe_nums, results, offset))
+                offset += len(probe_nums)
             
-            # Inter-probe delay
-            time.sleep(0.1)
+            for future in as_completed(futures):
+                future.result()
         
         print("=" * 60)
         
+        results = [result for result in results if result is not None]
+        read_nums = {result.probe_num for result in results}
+        failed_probes = [probe_num
+                         for _, probe_nums in bus_groups for probe_num in probe_nums
+                         if probe_num not in read_nums]
         if failed_probes:
             print(f"Failed to read from probes: {failed_probes}")
         
         return results
     
-    def print_summary(self, results: List[Dict[str, Any]]):
+    def read_all_probes_pipelined(self, probe_nums: Optional[List[int]] = None) -> List[ProbeResult]:
+        """
+        Read P values by sending all queries back-to-back on the reader's bus
+        
+        The responses are read as one block and routed back to their probes
+        by the probe parameter byte, so a silent probe costs one read timeout
+        for the whole scan instead of a round-trip each.
+        
+        Args:
+            probe_nums: Probes to query (default: 1-9)
+            
+        Returns:
+            List of probe results, in probe_nums order
+        """
+        if probe_nums is None:
+            probe_nums = list(range(1, 10))
+        probe_nums = list(dict.fromkeys(probe_nums))
+        commands = b''.join(self.create_query_command(n) for n in probe_nums)
+        probe_by_param = {self.PROBE_PARAMS[n]: n for n in probe_nums}
+        
+        try:
+            self.serial_port.reset_input_buffer()
+            self.serial_port.write(commands)
+            self.serial_port.flush()
+            buffer = self.serial_port.read(self.EXPECTED_RESPONSE_LENGTH * len(probe_nums))
+        except Exception as e:
+            print(f"Error querying probes: {e}")
+            return []
+        
+        # Walk the buffer frame by frame, resyncing on the next header
+        # whenever a frame does not validate
+        header = bytes([self.ADDR_CODE, self.CMD_CODE])
+        parsed = {}
+        pos = buffer.find(header)
+        while 0 <= pos <= len(buffer) - self.EXPECTED_RESPONSE_LENGTH:
+            frame = buffer[pos:pos + self.EXPECTED_RESPONSE_LENGTH]
+            probe_num = probe_by_param.get(frame[2])
+            if probe_num is not None and self.validate_response(frame, probe_num):
+                parsed[probe_num] = self.parse_response(frame, probe_num)
+                pos = buffer.find(header, pos + self.EXPECTED_RESPONSE_LENGTH)
+            else:
+                pos = buffer.find(header, pos + 1)
+        
+        failed_probes = [n for n in probe_nums if n not in parsed]
+        if failed_probes:
+            print(f"Failed to read from probes: {failed_probes}")
+        
+        return [parsed[n] for n in probe_nums if n in parsed]
+    
+    def print_summary(self, results: List[ProbeResult]):
         """
         Print summary of all probe P values
         
@@ -324,15 +622,9 @@ class KS236PValueReader:
         
         # Check if all probes have identical P values
         if len(results) > 1:
-            first_probe = results[0]
-            all_identical = True
-            for result in results[1:]:
-                for p_name in first_probe['main_phase_params']:
-                    if result['main_phase_params'][p_name]['value'] != first_probe['main_phase_params'][p_name]['value']:
-                        all_identical = False
-                        break
-                if not all_identical:
-                    break
+            # Main phase parameters P1-P12 are response bytes 3-14
+            first = results[0].response[3:15]
+            all_identical = all(result.response[3:15] == first for result in results[1:])
             
             if all_identical:
                 print("✓ All probes have identical P-value configuration")
@@ -342,34 +634,40 @@ class KS236PValueReader:
         display_probes = [results[0]] if len(results) > 1 and all_identical else results
         
         for result in display_probes:
-            probe_num = result['probe_num']
+            probe_num = result.probe_num
             print(f"PROBE {probe_num} P-VALUES:")
             print("-" * 40)
             
             # Main phase parameters
             print("Main Phase Parameters (Control beam angle for distance ranges):")
-            for p_name, p_data in result['main_phase_params'].items():
+            for p_name, p_data in result.main_phase_params.items():
                 print(f"  {p_name:3}: {p_data['value']:2d} ({p_data['hex']}) - {p_data['range']}")
             
             # Auxiliary parameters
             print("\nAuxiliary Parameters:")
-            for p_name, p_data in result['auxiliary_params'].items():
+            for p_name, p_data in result.auxiliary_params.items():
                 status = "✓ DEFAULT" if p_data['is_default'] else "⚠ CUSTOM"
                 print(f"  {p_name:3}: {p_data['value']:2d} ({p_data['hex']}) - {p_data['description']} [{status}]")
             
-            print(f"\nRaw Response: {result['raw_response']}")
+            if result.inferred:
+                print(f"\nRaw Response: (not queried, assumed identical to probe {result.replicated_from})")
+            else:
+                print(f"\nRaw Response: {result.raw_response}")
             print()
         
         # If all identical, show which probes are active
         if len(results) > 1 and all_identical:
-            active_probes = [r['probe_num'] for r in results]
+            active_probes = [r.probe_num for r in results if not r.inferred]
             print(f"Active probes with this configuration: {active_probes}")
+            inferred = [r.probe_num for r in results if r.inferred]
+            if inferred:
+                print(f"Not queried, assumed identical (--fast): {inferred}")
             print()
         
         # Analysis
         self.analyze_configuration(results[0] if all_identical else None)
     
-    def analyze_configuration(self, sample_result: Optional[Dict[str, Any]]):
+    def analyze_configuration(self, sample_result: Optional[ProbeResult]):
         """
         Analyze P-value configuration and provide insights
         
@@ -383,11 +681,12 @@ class KS236PValueReader:
         print("CONFIGURATION ANALYSIS:")
         print("-" * 40)
         
-        main_params = sample_result['main_phase_params']
+        p_values = sample_result.p_values
+        names = self._P_NAMES
         
         # Analyze beam focus pattern
-        p1_3_avg = sum(main_params[f'P{i}']['value'] for i in range(1, 4)) / 3
-        p4_12_avg = sum(main_params[f'P{i}']['value'] for i in range(4, 13)) / 9
+        p1_3_avg = sum(p_values[0:3]) / 3
+        p4_12_avg = sum(p_values[3:12]) / 9
         
         print(f"Close-range focus (P1-P3 avg): {p1_3_avg:.1f}")
         print(f"Long-range focus (P4-P12 avg): {p4_12_avg:.1f}")
@@ -400,18 +699,249 @@ class KS236PValueReader:
             print("→ Balanced configuration for mixed-range detection")
         
         # Check for maximum focus
-        max_focus_params = [p for p, data in main_params.items() if data['value'] == 31]
+        max_focus_params = [names[i] for i, value in enumerate(p_values[:12]) if value == 31]
         if max_focus_params:
             print(f"Maximum focus (P=31) applied to: {', '.join(max_focus_params)}")
         
         # Check auxiliary parameters
-        aux_params = sample_result['auxiliary_params']
-        custom_aux = [p for p, data in aux_params.items() if not data['is_default']]
+        defaults = self._AUX_DEFAULT_BY_IDX
+        custom_aux = [names[i] for i in range(12, 17) if p_values[i] != defaults[i]]
         if custom_aux:
             print(f"⚠ Custom auxiliary parameters: {', '.join(custom_aux)}")
         else:
             print("✓ All auxiliary parameters at default values")
 
+class AsyncKS236PValueReader(KS236PValueReader):
+    """
+    asyncio variant of KS236PValueReader built on pyserial-asyncio
+    
+    Each bus is an asyncio stream pair guarded by an asyncio.Lock, so retries
+    and inter-probe delays on one bus are awaited while other buses keep
+    polling, without a thread per bus.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._async_buses = {}
+    
+    async def connect_async(self, device_path: Optional[str] = None) -> bool:
+        """
+        Open a serial port as an asyncio stream pair
+        
+        Args:
+            device_path: Serial device path (default: the reader's device)
+            
+        Returns:
+            True if connection successful
+        """
+        device_path = device_path or self.device_path
+        if serial_asyncio is None:
+            print("✗ pyserial-asyncio is not installed (pip install pyserial-asyncio)")
+            return False
+        try:
+            reader, writer = await serial_asyncio.open_serial_connection(
+                url=device_path,
+                baudrate=self.baudrate,
+                bytesize=serial.EIGHTBITS,
+                parity=serial.PARITY_NONE,
+                stopbits=serial.STOPBITS_ONE
+            )
+        except serial.SerialException as e:
+            print(f"✗ Failed to connect to {device_path}: {e}")
+            return False
+        self._set_ftdi_latency(device_path, 1)
+        self._async_buses[device_path] = (reader, writer, asyncio.Lock())
+        print(f"✓ Connected to {device_path} at {self.baudrate} baud")
+        return True
+    
+    async def disconnect_async(self):
+        """Close all serial streams"""
+        for _, writer, _ in self._async_buses.values():
+            writer.close()
+            print("✓ Serial connection closed")
+        self._async_buses.clear()
+    
+    @staticmethod
+    async def _discard_pending(reader: asyncio.StreamReader):
+        """Drop bytes left over from a timed-out or malformed exchange"""
+        while not reader.at_eof():
+            try:
+                if not await asyncio.wait_for(reader.read(256), timeout=0.01):
+                    return  # EOF: nothing more will arrive
+            except asyncio.TimeoutError:
+                return
+    
+    async def query_probe_async(self, probe_num: int, max_retries: int = 3,
+                                device_path: Optional[str] = None) -> Optional[ProbeResult]:
+        """
+        Query single probe with retry mechanism
+        
+        Args:
+            probe_num: Probe number (1-9)
+            max_retries: Maximum retry attempts
+            device_path: Bus the probe is wired to (default: the reader's device)
+            
+        Returns:
+            Parsed probe data or None if failed
+        """
+        command = self.create_query_command(probe_num)
+        reader, writer, _ = self._async_buses[device_path or self.device_path]
+        
+        for attempt in range(max_retries):
+            try:
+                writer.write(command)
+                await writer.drain()
+                response = await asyncio.wait_for(
+                    reader.readexactly(self.EXPECTED_RESPONSE_LENGTH), timeout=self.timeout)
+                
+                if self.validate_response(response, probe_num):
+                    return self.parse_response(response, probe_num)
+                print(f"Warning: Probe {probe_num} attempt {attempt + 1} - invalid response format")
+                await asyncio.sleep(0.01)
+            except asyncio.TimeoutError:
+                print(f"Warning: Probe {probe_num} attempt {attempt + 1} - no response")
+            except asyncio.IncompleteReadError as e:
+                print(f"Warning: Probe {probe_num} attempt {attempt + 1} - incomplete response ({len(e.partial)} bytes)")
+            except Exception as e:
+                print(f"Error querying probe {probe_num} attempt {attempt + 1}: {e}")
+                if attempt < max_retries - 1:
+                    await asyncio.sleep(0.2)
+            
+            await self._discard_pending(reader)
+        
+        return None
+    
+    async def _poll_bus_async(self, device_path: str, probe_nums: List[int]) -> List[Optional[ProbeResult]]:
+        """Query the probes wired to one bus in order"""
+        _, _, lock = self._async_buses[device_path]
+        results = []
+        for probe_num in probe_nums:
+            async with lock:
+                print(f"Querying probe {probe_num}...")
+                result = await self.query_probe_async(probe_num, device_path=device_path)
+                
+                if result:
+                    print(f"✓ Probe {probe_num}: Successfully read P values")
+                else:
+                    print(f"✗ Probe {probe_num}: Failed to read P values")
+            
+            results.append(result)
+            
+            # Inter-probe delay, outside the lock so the bus is free meanwhile
+            await asyncio.sleep(0.1)
+        return results
+    
+    async def read_all_probes_async(self, bus_groups: Optional[List[Tuple[str, List[int]]]] = None) -> List[ProbeResult]:
+        """
+        Read P values from all probes (1-9)
+        
+        Args:
+            bus_groups: List of (device_path, probe_nums) pairs, one per RS485
+                adapter. Defaults to probes 1-9 on the reader's device.
+                Probes on different buses are polled concurrently.
+        
+        Returns:
+            List of probe results, in bus_groups order
+        """
+        if bus_groups is None:
+            bus_groups = [(self.device_path, list(range(1, 10)))]
+        
+        for device_path in dict.fromkeys(path for path, _ in bus_groups):
+            if device_path not in self._async_buses and not await self.connect_async(device_path):
+                return []
+        
+        print("Reading P values from probes 1-9...")
+        print("=" * 60)
+        
+        per_bus = await asyncio.gather(*(self._poll_bus_async(device_path, probe_nums)
+                                         for device_path, probe_nums in bus_groups))
+        
+        print("=" * 60)
+        
+        results = [result for bus_results in per_bus for result in bus_results if result is not None]
+        read_nums = {result.probe_num for result in results}
+        failed_probes = [probe_num
+                         for _, probe_nums in bus_groups for probe_num in probe_nums
+                         if probe_num not in read_nums]
+        if failed_probes:
+            print(f"Failed to read from probes: {failed_probes}")
+        
+        return results
+
+async def serve_daemon(reader: KS236PValueReader, socket_path: str) -> bool:
+    """
+    Serve P-value scans over a Unix socket, keeping the serial port open
+    
+    Each client connection sends one line (its content is ignored), triggers
+    one read_all_probes() and receives the results as a single JSON line,
+    or {"error": ...} if the scan raised. Scans are serialized, since they
+    share the bus.
+    
+    Args:
+        reader: Connected P-value reader
+        socket_path: Filesystem path of the Unix socket
+        
+    Returns:
+        False if the socket path is taken and the daemon did not start
+    """
+    loop = asyncio.get_running_loop()
+    scan_lock = asyncio.Lock()
+    
+    async def handle_client(stream_reader: asyncio.StreamReader, stream_writer: asyncio.StreamWriter):
+        try:
+            if not await stream_reader.readline():
+                return  # Client closed without sending a request
+            async with scan_lock:
+                try:
+                    results = await loop.run_in_executor(None, reader.read_all_probes)
+                except Exception as e:
+                    stream_writer.write(json.dumps({'error': str(e)}).encode() + b'\n')
+                    await stream_writer.drain()
+                    return
+            payload = [{
+                'probe_num': r.probe_num,
+                'probe_id': r.probe_id,
+                'p_values': list(r.p_values),
+                'raw_response': r.raw_response,
+                'inferred': r.inferred,
+                'replicated_from': r.replicated_from
+            } for r in results]
+            stream_writer.write(json.dumps(payload).encode() + b'\n')
+            await stream_writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            stream_writer.close()
+    
+    # Only a socket left behind by a daemon that is no longer listening may
+    # be removed; anything else at the path is left alone
+    try:
+        mode = os.stat(socket_path).st_mode
+    except FileNotFoundError:
+        mode = None
+    if mode is not None:
+        if not stat.S_ISSOCK(mode):
+            print(f"✗ {socket_path} exists and is not a socket")
+            return False
+        try:
+            _, probe_writer = await asyncio.open_unix_connection(socket_path)
+        except OSError:
+            os.unlink(socket_path)
+        else:
+            probe_writer.close()
+            print(f"✗ Another daemon is already serving on {socket_path}")
+            return False
+    
+    server = await asyncio.start_unix_server(handle_client, path=socket_path)
+    print(f"✓ Serving P-value scans on {socket_path}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+    return True
+
 def main():
     """Main function with command line interface"""
     parser = argparse.ArgumentParser(
@@ -422,6 +952,8 @@ Examples:
   python ks236_p_get.py                    # Read from default device
   python ks236_p_get.py --device /dev/ttyUSB0  # Use specific device
   python ks236_p_get.py --timeout 5        # Increase timeout
+  python ks236_p_get.py --fast             # Stop querying once probes 1-2 match
+  python ks236_p_get.py --daemon           # Keep the port open, scan per socket request
         """
     )
     
@@ -441,13 +973,26 @@ Examples:
                        action='store_true',
                        help='Enable verbose output')
     
+    parser.add_argument('--fast',
+                       action='store_true',
+                       help='Skip the remaining probes once the first two report identical P values')
+    
+    parser.add_argument('--daemon',
+                       action='store_true',
+                       help='Keep the serial port open and serve scans as JSON over a Unix socket')
+    
+    parser.add_argument('--socket',
+                       default='/run/ks236.sock',
+                       help='Unix socket path for --daemon (default: /run/ks236.sock)')
+    
     args = parser.parse_args()
     
     # Create reader instance
     reader = KS236PValueReader(
         device_path=args.device,
         baudrate=args.baudrate,
-        timeout=args.timeout
+        timeout=args.timeout,
+        fast=args.fast
     )
     
     try:
@@ -455,15 +1000,23 @@ Examples:
         if not reader.connect():
             sys.exit(1)
         
+        if args.daemon:
+            sys.exit(0 if asyncio.run(serve_daemon(reader, args.socket)) else 1)
+        
         # Read all probes
         results = reader.read_all_probes()
         
         # Display results
         reader.print_summary(results)
         
-        # Exit with appropriate code
-        if results:
-            print(f"\n✓ Successfully read P values from {len(results)} probes")
+        # Exit with appropriate code; probes inferred by --fast were never
+        # contacted and do not count as read
+        queried = [r.probe_num for r in results if not r.inferred]
+        inferred = [r.probe_num for r in results if r.inferred]
+        if queried:
+            print(f"\n✓ Successfully read P values from {len(queried)} probes")
+            if inferred:
+                print(f"↺ Assumed identical, not queried (--fast): {inferred}")
             sys.exit(0)
         else:
             print(f"\n✗ Failed to read P values from any probes")
@@ -32,7 +32,17 @@ import time
 import argparse
 import sys
 import json
-from typing import Optional, Dict, List, Any, Union
+import os
+import struct
+from functools import reduce
+from concurrent.futures import ThreadPoolExecutor
+from operator import xor
+from typing import Optional, Dict, List, Any, Union, Tuple
+
+try:
+    import orjson  # Optional, faster profile load/save
+except ImportError:
+    orjson = None
 
 class KS236PValueSetter:
     """KS236 ultrasonic probe P-value parameter setter"""
@@ -40,6 +50,15 @@ class KS236PValueSetter:
     # Protocol constants
     ADDR_CODE = 0xE8
     CMD_CODE = 0x99
+    FRAME_HEADER = bytes((ADDR_CODE, CMD_CODE))
+    
+    # Set acknowledgement status byte -> (success, message); unknown
+    # statuses are retried
+    STATUS_MSG = {
+        0x00: (True, "✓ Setting successful"),
+        0x02: (False, "✗ Parameter error"),
+        0xFF: (False, "✗ Setting failed"),
+    }
     
     # Probe parameter mappings for setting
     PROBE_TEMP_PARAMS = {  # Temporary setting (0xC1-0xC9)
@@ -114,7 +133,22 @@ class KS236PValueSetter:
         }
     }
     
-    def __init__(self, device_path: str = '/dev/ttyUS', baudrate: int = 115200, timeout: int = 3):
+    READ_POLL_INTERVAL = 0.05  # Per-read serial timeout while waiting for a frame
+    PERMANENT_ACK_MARGIN = 0.5  # Extra ack wait on top of timeout for EEPROM writes
+    PVALUE_CACHE_TTL = 2.0  # Seconds a known P vector is trusted as a baseline
+    
+    # Set commands and query responses both checksum 20 bytes: two 64-bit
+    # lanes and one 32-bit lane
+    _BCC_LANES_20 = struct.Struct('<QQI').unpack
+    
+    # Byte values accepted for a P parameter (0-31)
+    _VALID_P_BYTES = bytes(range(32))
+    
+    # Precompiled packer for the 4-byte query frame
+    _QUERY_FRAME = struct.Struct('4B')
+    
+    def __init__(self, device_path: str = '/dev/ttyUS', baudrate: int = 115200, timeout: int = 3,
+                 needs_drain: bool = False, verbose: bool = False):
         """
         Initialize the KS236 P-value setter
         
@@ -122,18 +156,41 @@ class KS236PValueSetter:
             device_path: Serial device path
             baudrate: Communication baudrate
             timeout: Read timeout in seconds
+            needs_drain: Wait for each frame to leave the transmitter before
+                reading, for adapters that switch line direction (RS-485)
+            verbose: Print the outgoing command and P values for every set
         """
         self.device_path = device_path
         self.baudrate = baudrate
         self.timeout = timeout
         self.serial_port = None
+        self._needs_drain = needs_drain
+        self.verbose = verbose
+        # Bytes received from the port but not yet consumed as a frame
+        self._rxbuf = bytearray()
+        # Background writer for profile files, created on first use
+        self._io_executor = None
+        # Last known P values per probe: {probe_num: (monotonic timestamp, values)}
+        self._pvalue_cache: Dict[int, Tuple[float, bytes]] = {}
+        
+        # Query frames never change, so they are built once per probe
+        header_xor = self.ADDR_CODE ^ self.CMD_CODE
+        self._query_commands = {
+            n: self._QUERY_FRAME.pack(self.ADDR_CODE, self.CMD_CODE, param, header_xor ^ param)
+            for n, param in self.PROBE_QUERY_PARAMS.items()
+        }
         
     def calculate_bcc(self, data: bytes) -> int:
         """Calculate BCC checksum (XOR of all bytes)"""
-        bcc = 0
-        for byte in data:
-            bcc ^= byte
-        return bcc
+        if len(data) == 20:
+            # XOR the lanes together, then fold the result 64 -> 32 -> 16 -> 8
+            low, high, tail = self._BCC_LANES_20(data)
+            acc = low ^ high ^ tail
+            acc ^= acc >> 32
+            acc ^= acc >> 16
+            acc ^= acc >> 8
+            return acc & 0xFF
+        return reduce(xor, data, 0)
     
     def connect(self) -> bool:
         """Establish serial connection"""
@@ -144,8 +201,9 @@ class KS236PValueSetter:
                 bytesize=serial.EIGHTBITS,
                 parity=serial.PARITY_NONE,
                 stopbits=serial.STOPBITS_ONE,
-                timeout=self.timeout,
-                write_timeout=1
+                timeout=self.READ_POLL_INTERVAL,
+                write_timeout=1,
+                exclusive=True  # Keep other processes from injecting stale bytes
             )
             print(f"✓ Connected to {self.device_path} at {self.baudrate} baud")
             return True
@@ -155,11 +213,91 @@ class KS236PValueSetter:
     
     def disconnect(self):
         """Close serial connection"""
+        self._pvalue_cache.clear()
+        self._rxbuf.clear()
+        if self._io_executor is not None:
+            # Let queued profile writes finish before returning
+            self._io_executor.shutdown(wait=True)
+            self._io_executor = None
         if self.serial_port and self.serial_port.is_open:
             self.serial_port.close()
             print("✓ Serial connection closed")
     
-    def read_probe_p_values(self, probe_num: int) -> Optional[List[int]]:
+    def _reset_input(self):
+        """Discard unread bytes in both the port and the receive buffer"""
+        # With exclusive access the driver is normally empty here, so skip
+        # the flush ioctl unless something is actually waiting
+        if self.serial_port.in_waiting:
+            self.serial_port.reset_input_buffer()
+        self._rxbuf.clear()
+    
+    def _write_frame(self, frame) -> int:
+        """
+        Write a complete frame without waiting for it to drain
+        
+        The response read cannot complete before the probe has seen the whole
+        frame anyway, so the blocking flush() is only paid when needs_drain
+        was requested.
+        """
+        bytes_sent = self.serial_port.write(frame)
+        if self._needs_drain:
+            self.serial_port.flush()
+        return bytes_sent
+    
+    def _read_frame(self, size: int, param: int, timeout: float) -> bytes:
+        """
+        Read the next frame for a probe parameter, returning as soon as it is complete
+        
+        Each read also pulls in whatever the driver already holds, and the
+        bytes are kept in a receive buffer that persists between exchanges.
+        Anything ahead of the expected header and parameter byte, such as a
+        late acknowledgement from an earlier exchange, is dropped; bytes past
+        the frame stay buffered for the next read.
+        
+        Args:
+            size: Expected frame length
+            param: Probe parameter byte the frame must carry
+            timeout: Longest time to wait for the whole frame, in seconds
+            
+        Returns:
+            Frame bytes, shorter than size if the deadline passed
+        """
+        port = self.serial_port
+        rxbuf = self._rxbuf
+        prefix = self.FRAME_HEADER + bytes((param,))
+        deadline = time.monotonic() + timeout
+        while True:
+            start = rxbuf.find(prefix)
+            if start < 0:
+                # Keep only a tail that could still grow into the prefix
+                del rxbuf[:max(0, len(rxbuf) - len(prefix) + 1)]
+            else:
+                del rxbuf[:start]
+                if len(rxbuf) >= size:
+                    frame = bytes(rxbuf[:size])
+                    del rxbuf[:size]
+                    return frame
+            if time.monotonic() >= deadline:
+                break
+            rxbuf += port.read(max(port.in_waiting, size - len(rxbuf)))
+        # Deadline passed: hand back the partial frame, the rest is stale
+        frame = bytes(rxbuf)
+        rxbuf.clear()
+        return frame
+    
+    def _cached_p_values(self, probe_num: int) -> Optional[bytes]:
+        """Return the cached P values if they are still fresh"""
+        entry = self._pvalue_cache.get(probe_num)
+        if entry and time.monotonic() - entry[0] < self.PVALUE_CACHE_TTL:
+            return entry[1]
+        return None
+    
+    @staticmethod
+    def _pvec_eq(a: Optional[bytes], b: bytes) -> bool:
+        """Compare two P-value vectors held as bytes (a single memcmp)"""
+        return a == b
+    
+    def read_probe_p_values(self, probe_num: int) -> Optional[bytes]:
         """
         Read current P values from probe
         
@@ -167,121 +305,264 @@ class KS236PValueSetter:
             probe_num: Probe number (1-9)
             
         Returns:
-            List of 17 P values or None if failed
+            17 P values as bytes (P1-P17) or None if failed
         """
         if probe_num not in self.PROBE_QUERY_PARAMS:
             print(f"✗ Invalid probe number: {probe_num}")
             return None
         
-        # Create query command
-        param = self.PROBE_QUERY_PARAMS[probe_num]
-        bcc = self.ADDR_CODE ^ self.CMD_CODE ^ param
-        command = bytes([self.ADDR_CODE, self.CMD_CODE, param, bcc])
+        command = self._query_commands[probe_num]
         
         try:
             # Send query
-            self.serial_port.reset_input_buffer()
-            self.serial_port.write(command)
-            self.serial_port.flush()
+            self._write_frame(command)
             
-            time.sleep(0.2)
-            
-            # Read response (21 bytes expected)
-            response = self.serial_port.read(21)
+            # Read response (21 bytes expected) as soon as it is complete
+            response = self._read_frame(21, self.PROBE_QUERY_PARAMS[probe_num], self.timeout)
             
             if len(response) == 21:
                 # Validate response
-                if response[0] == self.ADDR_CODE and response[1] == self.CMD_CODE:
+                if response.startswith(self.FRAME_HEADER):
                     # Validate BCC
                     expected_bcc = self.calculate_bcc(response[:-1])
                     if response[20] == expected_bcc:
-                        return list(response[3:20])  # P1-P17 values
+                        p_values = response[3:20]  # P1-P17 values
+                        self._pvalue_cache[probe_num] = (time.monotonic(), p_values)
+                        return p_values
             
+            self._pvalue_cache.pop(probe_num, None)
             print(f"✗ Invalid response from probe {probe_num}")
             return None
             
         except Exception as e:
+            self._pvalue_cache.pop(probe_num, None)
             print(f"✗ Error reading probe {probe_num}: {e}")
             return None
     
-    def set_probe_p_values(self, probe_num: int, p_values: List[int],
-                          permanent: bool = False, max_retries: int = 3) -> bool:
+    def _build_set_command(self, probe_num: int, p_values: Union[List[int], bytes],
+                           permanent: bool) -> Optional[bytearray]:
         """
-        Set probe P values
+        Validate P values and build the complete set command
         
         Args:
             probe_num: Probe number (1-9)
-            p_values: List of 17 P values (P1-P17)
+            p_values: 17 P values (P1-P17) as a list or bytes
             permanent: True for permanent modification, False for temporary
-            max_retries: Maximum retry attempts
             
         Returns:
-            True if setting successful
+            21-byte command frame including BCC, or None if the input is invalid
         """
         if probe_num not in self.PROBE_TEMP_PARAMS:
             print(f"✗ Invalid probe number: {probe_num}")
-            return False
+            return None
         
         if len(p_values) != 17:
             print(f"✗ Must provide exactly 17 P values, got {len(p_values)}")
-            return False
+            return None
         
-        # Validate P value ranges
-        for i, p_val in enumerate(p_values):
-            if not (0 <= p_val <= 31):
-                print(f"✗ P{i+1} value {p_val} out of range (0-31)")
-                return False
+        # Validate P value ranges in one pass: deleting every valid byte
+        # leaves nothing behind, and only a failed check walks the values
+        # to name the offending one
+        try:
+            packed = bytes(p_values)
+        except ValueError:
+            packed = None
+        if packed is None or packed.translate(None, self._VALID_P_BYTES):
+            for i, p_val in enumerate(p_values):
+                if not (0 <= p_val <= 31):
+                    print(f"✗ P{i+1} value {p_val} out of range (0-31)")
+                    return None
         
         # Select probe parameter code
         probe_params = self.PROBE_PERM_PARAMS if permanent else self.PROBE_TEMP_PARAMS
         param1 = probe_params[probe_num]
         
-        # Create command
-        command = bytes([self.ADDR_CODE, self.CMD_CODE, param1] + p_values)
+        # Fill the whole frame in one buffer and checksum it in place
+        command = bytearray(21)
+        command[0] = self.ADDR_CODE
+        command[1] = self.CMD_CODE
+        command[2] = param1
+        command[3:20] = packed
+        command[20] = self.calculate_bcc(memoryview(command)[:20])
+        return command
+    
+    def _exchange_set_command(self, full_command: bytearray, permanent: bool) -> bytes:
+        """Send one set command and return the raw acknowledgement"""
+        bytes_sent = self._write_frame(full_command)
+        if bytes_sent != len(full_command):
+            return b''
+        return self._read_frame(5, full_command[2], self._ack_timeout(permanent))
+    
+    def _ack_timeout(self, permanent: bool) -> float:
+        """Longest wait for a set acknowledgement, derived from the read timeout"""
+        return self.timeout + self.PERMANENT_ACK_MARGIN if permanent else self.timeout
+    
+    def _ack_outcome(self, response: bytes) -> Tuple[Optional[bool], str]:
+        """
+        Classify a 5-byte set acknowledgement
+        
+        Args:
+            response: Bytes read back after a set command
+            
+        Returns:
+            (success, message) for a status the probe answered definitely, or
+            (None, reason) when the ack is missing, malformed or has an
+            unknown status and the command may be resent
+        """
+        if len(response) < 5:
+            return None, f"✗ Invalid response length: {len(response)} bytes"
+        if not response.startswith(self.FRAME_HEADER):
+            return None, "✗ Invalid response format"
+        outcome = self.STATUS_MSG.get(response[3])
+        if outcome is None:
+            return None, f"✗ Unknown status: 0x{response[3]:02X}"
+        return outcome
+    
+    def _settle_permanent_write(self, probe_num: int,
+                                p_values: Union[List[int], bytes]) -> Optional[bool]:
+        """
+        Read a probe back after a permanent write went unacknowledged
+        
+        The EEPROM may already hold the new values even though the ack was
+        lost, so the write is only resent once the probe has been seen
+        without them.
+        
+        Args:
+            probe_num: Probe number (1-9)
+            p_values: 17 P values that were written
+            
+        Returns:
+            True if the probe already holds the values, False if its state
+            could not be read back, or None if the write may be resent
+        """
+        current = self.read_probe_p_values(probe_num)
+        if current is None:
+            print(f"✗ Probe {probe_num} could not be read back, not resending the permanent write")
+            self._pvalue_cache.pop(probe_num, None)
+            return False
+        if self._pvec_eq(current, bytes(p_values)):
+            print(f"✓ Probe {probe_num} read back with the new values")
+            self._record_set_result(probe_num, p_values, True)
+            return True
+        return None
+    
+    def _record_set_result(self, probe_num: int, p_values: Union[List[int], bytes], success: bool):
+        """Cache the values a probe accepted, or forget them after a rejection"""
+        if success:
+            self._pvalue_cache[probe_num] = (time.monotonic(), bytes(p_values))
+        else:
+            self._pvalue_cache.pop(probe_num, None)
+    
+    def set_multiple_probes(self, probe_values: Dict[int, Union[List[int], bytes]],
+                            permanent: bool = False) -> Dict[int, bool]:
+        """
+        Set P values on several probes, overlapping command building with bus I/O
+        
+        A single worker thread owns the serial port and performs each
+        write/read exchange in order, while the calling thread validates and
+        builds the next command. Probes whose acknowledgement is missing,
+        malformed or unknown are retried through set_probe_p_values; a probe
+        that rejects its values is reported without resending.
+        
+        Args:
+            probe_values: Dictionary mapping probe number to its 17 P values
+            permanent: True for permanent modification, False for temporary
+            
+        Returns:
+            Dictionary mapping probe number to whether its setting succeeded
+        """
+        results = {}
+        pending = []
+        with ThreadPoolExecutor(max_workers=1) as serial_io:
+            for probe_num, p_values in probe_values.items():
+                full_command = self._build_set_command(probe_num, p_values, permanent)
+                if full_command is None:
+                    results[probe_num] = False
+                    continue
+                future = serial_io.submit(self._exchange_set_command, full_command, permanent)
+                pending.append((probe_num, p_values, future))
+            
+            retry = []
+            for probe_num, p_values, future in pending:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    print(f"Error setting probe {probe_num}: {e}")
+                    response = b''
+                
+                success, message = self._ack_outcome(response)
+                if success is None:
+                    retry.append((probe_num, p_values))
+                else:
+                    # A definite answer from the probe; a rejected frame is
+                    # not resent
+                    print(f"Probe {probe_num}: {message}")
+                    self._record_set_result(probe_num, p_values, success)
+                    results[probe_num] = success
+        
+        # Missing, malformed or unknown acknowledgements go through the
+        # regular path, with its retries and status reporting; a permanent
+        # write is read back first so it is not repeated needlessly
+        for probe_num, p_values in retry:
+            if permanent:
+                settled = self._settle_permanent_write(probe_num, p_values)
+                if settled is not None:
+                    results[probe_num] = settled
+                    continue
+            results[probe_num] = self.set_probe_p_values(probe_num, p_values,
+                                                         permanent=permanent, max_retries=2)
+        return results
+    
+    def set_probe_p_values(self, probe_num: int, p_values: Union[List[int], bytes],
+                          permanent: bool = False, max_retries: int = 3) -> bool:
+        """
+        Set probe P values
         
-        # Calculate BCC
-        bcc = self.calculate_bcc(command)
-        full_command = command + bytes([bcc])
+        Args:
+            probe_num: Probe number (1-9)
+            p_values: 17 P values (P1-P17) as a list or bytes
+            permanent: True for permanent modification, False for temporary
+            max_retries: Maximum retry attempts
+            
+        Returns:
+            True if setting successful
+        """
+        full_command = self._build_set_command(probe_num, p_values, permanent)
+        if full_command is None:
+            return False
         
-        print(f"Setting probe {probe_num} ({'permanent' if permanent else 'temporary'}):")
-        print(f"  Command: {' '.join(f'{b:02X}' for b in full_command)}")
-        print(f"  Main phase (P1-P12): {p_values[:12]}")
-        print(f"  Auxiliary (P13-P17): {p_values[12:]}")
+        if self.verbose:
+            print(f"Setting probe {probe_num} ({'permanent' if permanent else 'temporary'}):")
+            print(f"  Command: {' '.join(f'{b:02X}' for b in full_command)}")
+            print(f"  Main phase (P1-P12): {list(p_values[:12])}")
+            print(f"  Auxiliary (P13-P17): {list(p_values[12:])}")
         
         # Send command with retries
         for attempt in range(max_retries):
             try:
-                self.serial_port.reset_input_buffer()
-                bytes_sent = self.serial_port.write(full_command)
-                self.serial_port.flush()
+                if attempt > 0:
+                    # Start a resend from a clean line
+                    self._reset_input()
+                bytes_sent = self._write_frame(full_command)
                 
                 if bytes_sent != len(full_command):
                     print(f"Warning: Only sent {bytes_sent}/{len(full_command)} bytes")
                     continue
                 
-                time.sleep(0.5)  # Wait for processing (especially for permanent writes)
+                # Read response (expect 5 bytes) as soon as it arrives; permanent
+                # writes get a longer deadline for the EEPROM update
+                response = self._read_frame(5, full_command[2], self._ack_timeout(permanent))
                 
-                # Read response (expect 5 bytes)
-                response = self.serial_port.read(5)
+                success, message = self._ack_outcome(response)
+                print(message)
+                if success is not None:
+                    self._record_set_result(probe_num, p_values, success)
+                    return success
                 
-                if len(response) >= 5:
-                    if response[0] == self.ADDR_CODE and response[1] == self.CMD_CODE:
-                        status = response[3]
-                        if status == 0x00:
-                            print("✓ Setting successful")
-                            return True
-                        elif status == 0x02:
-                            print("✗ Parameter error")
-                            return False
-                        elif status == 0xFF:
-                            print("✗ Setting failed")
-                            return False
-                        else:
-                            print(f"✗ Unknown status: 0x{status:02X}")
-                    else:
-                        print("✗ Invalid response format")
-                else:
-                    print(f"✗ Invalid response length: {len(response)} bytes")
+                if permanent:
+                    settled = self._settle_permanent_write(probe_num, p_values)
+                    if settled is not None:
+                        return settled
                 
                 if attempt < max_retries - 1:
                     print(f"Retrying... (attempt {attempt + 2}/{max_retries})")
@@ -289,9 +570,14 @@ class KS236PValueSetter:
                     
             except Exception as e:
                 print(f"Error on attempt {attempt + 1}: {e}")
+                if permanent:
+                    settled = self._settle_permanent_write(probe_num, p_values)
+                    if settled is not None:
+                        return settled
                 if attempt < max_retries - 1:
                     time.sleep(0.3)
         
+        self._pvalue_cache.pop(probe_num, None)
         print(f"✗ Failed to set probe {probe_num} after {max_retries} attempts")
         return False
     
@@ -309,17 +595,20 @@ class KS236PValueSetter:
         Returns:
             True if setting successful
         """
-        # Read current P values
-        print(f"Reading current P values for probe {probe_num}...")
-        current_values = self.read_probe_p_values(probe_num)
+        # Start from recently read or written values when available,
+        # otherwise read them from the probe
+        current_values = self._cached_p_values(probe_num)
+        if current_values is None:
+            print(f"Reading current P values for probe {probe_num}...")
+            current_values = self.read_probe_p_values(probe_num)
         if not current_values:
             print(f"✗ Failed to read current P values for probe {probe_num}")
             return False
         
-        print(f"Current P values: {current_values}")
+        print(f"Current P values: {list(current_values)}")
         
         # Apply updates
-        new_values = current_values.copy()
+        new_values = bytearray(current_values)
         for p_name, p_value in p_updates.items():
             if p_name not in self.P_DESCRIPTIONS:
                 print(f"✗ Invalid P parameter: {p_name}")
@@ -342,12 +631,13 @@ class KS236PValueSetter:
         success = self.set_probe_p_values(probe_num, new_values, permanent=permanent)
         
         if success and verify:
+            # The acknowledgement means the probe has applied the values,
+            # so the verify query can follow it immediately
             print(f"\nVerifying changes...")
-            time.sleep(0.5)
             
             updated_values = self.read_probe_p_values(probe_num)
             if updated_values:
-                print(f"Updated P values: {updated_values}")
+                print(f"Updated P values: {list(updated_values)}")
                 
                 # Check if changes were applied
                 all_correct = True
@@ -393,15 +683,14 @@ class KS236PValueSetter:
         print(f"Applying preset '{preset['name']}' to probe {probe_num}")
         print(f"Description: {preset['description']}")
         
-        success = self.set_probe_p_values(probe_num, preset['values'], permanent=permanent)
+        success = self.set_probe_p_values(probe_num, preset['values_bytes'], permanent=permanent)
         
         if success and verify:
             print(f"\nVerifying preset application...")
-            time.sleep(0.5)
             
             updated_values = self.read_probe_p_values(probe_num)
             if updated_values:
-                if updated_values == preset['values']:
+                if self._pvec_eq(updated_values, preset['values_bytes']):
                     print(f"🎉 Successfully applied preset '{preset['name']}'")
                     return True
                 else:
@@ -424,8 +713,9 @@ class KS236PValueSetter:
             List of 17 P values or None if failed
         """
         try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+            data = orjson.loads(raw) if orjson is not None else json.loads(raw)
             
             if 'p_values' in data and len(data['p_values']) == 17:
                 p_values = data['p_values']
@@ -443,8 +733,9 @@ class KS236PValueSetter:
             print(f"✗ Error loading profile from {file_path}: {e}")
             return None
     
-    def save_profile_to_file(self, p_values: List[int], file_path: str, 
-                           name: str = "", description: str = "") -> bool:
+    def save_profile_to_file(self, p_values: Union[List[int], bytes], file_path: str, 
+                           name: str = "", description: str = "",
+                           background: bool = False) -> bool:
         """
         Save P value profile to JSON file
         
@@ -453,20 +744,36 @@ class KS236PValueSetter:
             file_path: Output file path
             name: Profile name
             description: Profile description
+            background: True to queue the write on a worker thread and return
+                immediately; disconnect() waits for queued writes
             
         Returns:
-            True if successful
+            True if successful (or queued, when background is True)
         """
+        # Snapshot the values now so later changes by the caller don't leak in
+        profile = {
+            'name': name,
+            'description': description,
+            'p_values': list(p_values),
+            'created': time.strftime('%Y-%m-%d %H:%M:%S')
+        }
+        
+        if background:
+            if self._io_executor is None:
+                self._io_executor = ThreadPoolExecutor(max_workers=1)
+            self._io_executor.submit(self._write_profile, profile, file_path)
+            return True
+        return self._write_profile(profile, file_path)
+    
+    def _write_profile(self, profile: Dict[str, Any], file_path: str) -> bool:
+        """Write a prepared profile dictionary to a JSON file"""
         try:
-            profile = {
-                'name': name,
-                'description': description,
-                'p_values': p_values,
-                'created': time.strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
-            with open(file_path, 'w') as f:
-                json.dump(profile, f, indent=2)
+            if orjson is not None:
+                encoded = orjson.dumps(profile, option=orjson.OPT_INDENT_2)
+            else:
+                encoded = json.dumps(profile, indent=2).encode()
+            with open(file_path, 'wb') as f:
+                f.write(encoded)
             
             print(f"✓ Profile saved to {file_path}")
             return True
@@ -475,6 +782,95 @@ class KS236PValueSetter:
             print(f"✗ Error saving profile to {file_path}: {e}")
             return False
     
+    def apply_profile(self, probe_num: int, file_path: str,
+                      permanent: bool = False, verify: bool = True) -> bool:
+        """
+        Apply the P values stored in a JSON profile file
+        
+        Args:
+            probe_num: Probe number (1-9)
+            file_path: Path to JSON profile file
+            permanent: True for permanent modification
+            verify: True to verify setting after change
+            
+        Returns:
+            True if setting successful
+        """
+        p_values = self.load_profile_from_file(file_path)
+        if not p_values:
+            return False
+        
+        success = self.set_probe_p_values(probe_num, p_values, permanent=permanent)
+        if success and verify:
+            # Verify profile application
+            updated = self.read_probe_p_values(probe_num)
+            if self._pvec_eq(updated, bytes(p_values)):
+                print("🎉 Profile applied successfully")
+            else:
+                print("⚠️ Profile not applied correctly")
+                success = False
+        return success
+    
+    def run_batch(self, file_path: str, permanent: bool = False, verify: bool = True) -> bool:
+        """
+        Run a file of operations over the already open connection
+        
+        Each line names a probe and one operation; '#' starts a comment:
+            probe 1 preset narrow
+            probe 2 p4 25 p13 2
+            probe 3 profile custom.json
+        
+        Args:
+            file_path: Path to the batch file
+            permanent: True for permanent modification
+            verify: True to verify every setting after change
+            
+        Returns:
+            True if every operation succeeded
+        """
+        try:
+            with open(file_path, 'r') as f:
+                lines = f.readlines()
+        except OSError as e:
+            print(f"✗ Error reading batch file {file_path}: {e}")
+            return False
+        
+        all_ok = True
+        for line_no, line in enumerate(lines, 1):
+            tokens = line.split('#', 1)[0].split()
+            if not tokens:
+                continue
+            
+            success = None
+            if len(tokens) >= 4 and tokens[0].lower() == 'probe' and tokens[1].isdigit():
+                probe_num = int(tokens[1])
+                operation, operands = tokens[2].lower(), tokens[3:]
+                print(f"\n[{file_path}:{line_no}] probe {probe_num}: {' '.join(tokens[2:])}")
+                
+                if operation == 'preset' and len(operands) == 1:
+                    success = self.apply_preset(probe_num, operands[0],
+                                                permanent=permanent, verify=verify)
+                elif operation == 'profile' and len(operands) == 1:
+                    success = self.apply_profile(probe_num, operands[0],
+                                                 permanent=permanent, verify=verify)
+                elif len(tokens) % 2 == 0:
+                    # pN VALUE pairs
+                    try:
+                        p_updates = {name.upper(): int(value)
+                                     for name, value in zip(tokens[2::2], tokens[3::2])}
+                    except ValueError:
+                        p_updates = None
+                    if p_updates is not None:
+                        success = self.set_individual_p_values(probe_num, p_updates,
+                                                               permanent=permanent, verify=verify)
+            
+            if success is None:
+                print(f"✗ {file_path}:{line_no}: cannot parse '{line.strip()}'")
+                success = False
+            all_ok = all_ok and success
+        
+        return all_ok
+    
     def list_presets(self):
         """Display available beam angle presets"""
         print("Available Beam Angle Presets:")
@@ -486,6 +882,15 @@ class KS236PValueSetter:
             print(f"{'':12}  P1-P12: {preset_data['values'][:12]}")
             print()
 
+# Presets are sent and compared as bytes; keep a converted copy of each
+for _preset in KS236PValueSetter.BEAM_PRESETS.values():
+    _preset['values_bytes'] = bytes(_preset['values'])
+del _preset
+
+# argparse destinations of the --p1 ... --p17 options
+P_ARG_NAMES = tuple(f'p{i}' for i in range(1, 18))
+
+
 def main():
     """Main function with command line interface"""
     parser = argparse.ArgumentParser(
@@ -505,8 +910,15 @@ Examples:
   # Set single P value temporarily
   python ks236_p_set.py --probe 2 --p4 25
   
+  # Run several operations over one connection
+  python ks236_p_set.py --batch ops.txt
+  
   # List available presets
   python ks236_p_set.py --list-presets
+
+Batch files hold one operation per line, e.g. "probe 1 preset narrow" or
+"probe 2 p4 25 p13 2". Set KS236_PERMANENT=1 to make --permanent the default
+(--temporary still forces a temporary write).
         """
     )
     
@@ -529,18 +941,28 @@ Examples:
     )
     
     # Individual P value arguments
-    for i in range(1, 18):
+    for i, name in enumerate(P_ARG_NAMES, 1):
         parser.add_argument(
-            f'--p{i}',
+            f'--{name}',
             type=int,
             metavar=f'0-31',
             help=f'Set P{i} value (0-31)'
         )
     
-    parser.add_argument(
+    write_mode = parser.add_mutually_exclusive_group()
+    write_mode.add_argument(
         '--permanent',
         action='store_true',
-        help='Make changes permanent (stored in EEPROM)'
+        help='Make changes permanent (stored in EEPROM); the default when KS236_PERMANENT=1'
+    )
+    write_mode.add_argument(
+        '--temporary',
+        dest='permanent',
+        action='store_false',
+        help='Make changes temporary, overriding KS236_PERMANENT'
+    )
+    parser.set_defaults(
+        permanent=os.environ.get('KS236_PERMANENT', '').lower() in ('1', 'true', 'yes')
     )
     
     parser.add_argument(
@@ -574,6 +996,12 @@ Examples:
         help='Save current probe P values to JSON file'
     )
     
+    parser.add_argument(
+        '--batch',
+        metavar='FILE',
+        help='Run the operations listed in FILE over a single connection'
+    )
+    
     parser.add_argument(
         '--list-presets',
         action='store_true',
@@ -583,7 +1011,7 @@ Examples:
     parser.add_argument(
         '--verbose', '-v',
         action='store_true',
-        help='Enable verbose output'
+        help='Enable verbose output (show each set command and its P values)'
     )
     
     args = parser.parse_args()
@@ -595,20 +1023,31 @@ Examples:
         return
     
     # Validate required arguments
-    if not args.probe:
+    if args.batch and args.probe:
+        parser.error("--probe cannot be combined with --batch (each batch line names its probe)")
+    if not args.probe and not args.batch:
         print("✗ Probe number is required (use --probe)")
         sys.exit(1)
     
+    # Collect the individual P values given on the command line
+    arg_values = vars(args)
+    p_args = {
+        f'P{i}': arg_values[name]
+        for i, name in enumerate(P_ARG_NAMES, 1)
+        if arg_values[name] is not None
+    }
+    
     # Count operation types
     operations = sum([
         bool(args.preset),
         bool(args.profile),
-        any(getattr(args, f'p{i}') is not None for i in range(1, 18)),
-        bool(args.save_profile)
+        bool(p_args),
+        bool(args.save_profile),
+        bool(args.batch)
     ])
     
     if operations == 0:
-        print("✗ No operation specified. Use --preset, --profile, --p1-p17, or --save-profile")
+        print("✗ No operation specified. Use --preset, --profile, --p1-p17, --save-profile, or --batch")
         sys.exit(1)
     elif operations > 1:
         print("✗ Only one operation allowed at a time")
@@ -618,7 +1057,8 @@ Examples:
     setter = KS236PValueSetter(
         device_path=args.device,
         baudrate=args.baudrate,
-        timeout=args.timeout
+        timeout=args.timeout,
+        verbose=args.verbose
     )
     
     try:
@@ -628,7 +1068,11 @@ Examples:
         
         verify = not args.no_verify
         
-        if args.save_profile:
+        if args.batch:
+            # Run every listed operation over this connection
+            success = setter.run_batch(args.batch, permanent=args.permanent, verify=verify)
+        
+        elif args.save_profile:
             # Save current values to file
             print(f"Reading current P values from probe {args.probe}...")
             current_values = setter.read_probe_p_values(args.probe)
@@ -653,38 +1097,20 @@ Examples:
             
         elif args.profile:
             # Load and apply profile
-            p_values = setter.load_profile_from_file(args.profile)
-            if p_values:
-                success = setter.set_probe_p_values(
-                    args.probe, p_values,
-                    permanent=args.permanent
-                )
-                if success and verify:
-                    # Verify profile application
-                    time.sleep(0.5)
-                    updated = setter.read_probe_p_values(args.probe)
-                    if updated == p_values:
-                        print("🎉 Profile applied successfully")
-                    else:
-                        print("⚠️ Profile not applied correctly")
-                        success = False
-            else:
-                success = False
+            success = setter.apply_profile(
+                args.probe, args.profile,
+                permanent=args.permanent, verify=verify
+            )
         
         else:
             # Set individual P values
-            p_updates = {}
-            for i in range(1, 18):
-                value = getattr(args, f'p{i}')
-                if value is not None:
-                    if 0 <= value <= 31:
-                        p_updates[f'P{i}'] = value
-                    else:
-                        print(f"✗ P{i} value {value} out of range (0-31)")
-                        sys.exit(1)
+            for p_name, value in p_args.items():
+                if not 0 <= value <= 31:
+                    print(f"✗ {p_name} value {value} out of range (0-31)")
+                    sys.exit(1)
             
             success = setter.set_individual_p_values(
-                args.probe, p_updates,
+                args.probe, p_args,
                 permanent=args.permanent, verify=verify
             )
         